@@ -0,0 +1,213 @@
+# backend/archive.py
+"""
+Archive of old calorie entries, partitioned by month.
+
+Entries older than the archive horizon (ARCHIVE_AFTER_DAYS, one year by default) are moved
+out of calorie_entries into one table per calendar month (calorie_entries_YYYY_MM), listed
+in entry_archive_partitions. The hot table then only holds recent entries, so it and its
+indexes stay small enough to stay in cache however long users keep their diary.
+
+Archived entries are still served by the same API:
+- GET /entries/ reads the partitions overlapping the requested range and merges them with
+  the hot table (see crud.list_entries), in the same order and with the same cursors.
+- /stats/ never reads partitions: the per-day summaries in daily_totals are kept when
+  entries are archived, so they cover hot and archived entries alike.
+- Updating or deleting an archived entry first moves it back into the hot table
+  (the next archive run moves it out again).
+
+Run it periodically (one run at a time), e.g. daily from cron:
+    python archive.py run [--older-than-days 365]
+    python archive.py status
+"""
+import argparse
+import os
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+# Columns copied between the hot table and the partitions
+ARCHIVED_COLUMNS = ("id", "user_id", "food_name", "calories", "meal_type", "consumed_at")
+
+# Entries moved per batch of statements, so the id list of a busy month stays small
+ARCHIVE_BATCH_SIZE = 5000
+
+# Partition tables aren't models: they are defined on demand, one per month
+_partition_metadata = MetaData()
+_partition_lock = threading.Lock()
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_table(month: date) -> Table:
+    """
+    Returns the table holding the archived entries of the month starting on `month`.
+    Same columns as calorie_entries, with the same (user_id, consumed_at, id) index.
+    """
+    name = f"calorie_entries_{month.year:04d}_{month.month:02d}"
+    with _partition_lock: # Handlers in the threadpool may define the same table concurrently
+        table = _partition_metadata.tables.get(name)
+        if table is None:
+            table = Table(
+                name,
+                _partition_metadata,
+                Column("id", Integer, primary_key=True, autoincrement=False), # Ids are kept from the hot table
+                Column("user_id", Integer, nullable=False),
+                Column("food_name", String),
+                Column("calories", Float),
+                Column("meal_type", String),
+                Column("consumed_at", DateTime),
+                Index(f"ix_{name}_user_id_consumed_at_id", "user_id", "consumed_at", "id"),
+                info={"month": month},
+            )
+        return table
+
+
+def partition_tables(
+    db: Session,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[Table]:
+    """
+    Returns the partitions that may hold entries between `date_from` and `date_to`
+    (inclusive, either may be None), newest month first.
+    """
+    stmt = (
+        select(models.ArchivePartition.month)
+        .where(models.ArchivePartition.entry_count > 0)
+        .order_by(models.ArchivePartition.month.desc())
+    )
+    if date_from is not None:
+        stmt = stmt.where(models.ArchivePartition.month >= month_start(date_from))
+    if date_to is not None:
+        stmt = stmt.where(models.ArchivePartition.month <= date_to)
+    return [partition_table(month) for month in db.execute(stmt).scalars()]
+
+
+def _add_to_count(db: Session, month: date, count: int) -> None:
+    db.execute(
+        update(models.ArchivePartition)
+        .where(models.ArchivePartition.month == month)
+        .values(entry_count=models.ArchivePartition.entry_count + count)
+    )
+
+
+def restore_entry(db: Session, user_id: int, entry_id: int) -> Optional[models.CalorieEntry]:
+    """
+    Moves an archived entry of this user back into the hot table and returns it,
+    or returns None if there is no such archived entry.
+    Does not commit: the caller commits together with the change it makes to the entry.
+    """
+    for table in partition_tables(db):
+        where = and_(table.c.id == entry_id, table.c.user_id == user_id)
+        # Restore the row the DELETE removed, so two concurrent restores can't both copy it
+        stmt = delete(table).where(where).returning(*(table.c[name] for name in ARCHIVED_COLUMNS))
+        row = db.execute(stmt).first()
+        if row is None:
+            continue
+        db.execute(insert(models.CalorieEntry.__table__).values(dict(zip(ARCHIVED_COLUMNS, row))))
+        _add_to_count(db, table.info["month"], -1)
+        return db.get(models.CalorieEntry, entry_id)
+    return None
+
+
+def archive_entries(db: Session, cutoff: datetime) -> Dict[date, int]:
+    """
+    Moves every entry consumed before `cutoff` (naive UTC) into the partition of its month,
+    one transaction per month. Returns the number of entries moved per month.
+    """
+    hot = models.CalorieEntry.__table__
+    ts = pagination.timestamp_column(db, hot)
+    oldest = db.execute(
+        select(func.min(hot.c.consumed_at)).where(ts < pagination.timestamp_value(db, cutoff))
+    ).scalar()
+    moved: Dict[date, int] = {}
+    if oldest is None:
+        return moved
+
+    month = month_start(oldest.date())
+    while datetime.combine(month, time.min) < cutoff:
+        end = min(datetime.combine(next_month(month), time.min), cutoff)
+        where = and_(
+            ts >= pagination.timestamp_value(db, datetime.combine(month, time.min)),
+            ts < pagination.timestamp_value(db, end),
+        )
+        if db.execute(select(hot.c.id).where(where).limit(1)).first() is not None:
+            table = partition_table(month)
+            table.create(bind=db.connection(), checkfirst=True)
+            # Move a fixed set of ids: INSERT and DELETE with the same predicate would also delete
+            # entries added between the two under READ COMMITTED, without archiving them.
+            # FOR UPDATE keeps the rows from changing until commit (SQLite holds the write lock anyway).
+            batch = select(hot.c.id).where(where).limit(ARCHIVE_BATCH_SIZE).with_for_update()
+            count = 0
+            while True:
+                ids = db.execute(batch).scalars().all()
+                if not ids:
+                    break
+                columns = select(*(hot.c[name] for name in ARCHIVED_COLUMNS)).where(hot.c.id.in_(ids))
+                db.execute(insert(table).from_select(list(ARCHIVED_COLUMNS), columns))
+                db.execute(delete(hot).where(hot.c.id.in_(ids)))
+                count += len(ids)
+            if db.get(models.ArchivePartition, month) is None:
+                db.add(models.ArchivePartition(month=month, table_name=table.name, entry_count=0))
+                db.flush()
+            _add_to_count(db, month, count)
+            db.execute(
+                update(models.ArchivePartition)
+                .where(models.ArchivePartition.month == month)
+                .values(archived_at=func.now())
+            )
+            db.commit() # Readers see the entries of a month either in the hot table or in its partition
+            moved[month] = count
+        month = next_month(month)
+    return moved
+
+
+def horizon(older_than_days: int = ARCHIVE_AFTER_DAYS) -> datetime:
+    # Start of the first day that stays in the hot table, in UTC like consumed_at
+    today = datetime.now(timezone.utc).date()
+    return datetime.combine(today - timedelta(days=older_than_days), time.min)
+
+
+if __name__ == "__main__":
+    import database
+    import migrations
+
+    parser = argparse.ArgumentParser(description="Archive old calorie entries into monthly tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_command = commands.add_parser("run", help="Move entries older than the horizon into the archive.")
+    run_command.add_argument(
+        "--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+        help=f"Archive horizon in days (default: ARCHIVE_AFTER_DAYS, {ARCHIVE_AFTER_DAYS})",
+    )
+    commands.add_parser("status", help="List the archive partitions.")
+    args = parser.parse_args()
+
+    migrations.upgrade(database.engine)
+    with database.SessionLocal() as db:
+        if args.command == "run":
+            cutoff = horizon(args.older_than_days)
+            moved = archive_entries(db, cutoff)
+            for month, count in sorted(moved.items()):
+                print(f"{month:%Y-%m}: archived {count} entries")
+            print(f"Archived {sum(moved.values())} entries consumed before {cutoff:%Y-%m-%d}")
+        else:
+            hot_count = db.execute(select(func.count()).select_from(models.CalorieEntry)).scalar()
+            print(f"calorie_entries (hot): {hot_count} entries")
+            for partition in db.execute(select(models.ArchivePartition).order_by(models.ArchivePartition.month)).scalars():
+                print(f"{partition.table_name}: {partition.entry_count} entries, last archived {partition.archived_at}")
+    database.engine.dispose()
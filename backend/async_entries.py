@@ -0,0 +1,102 @@
+# backend/async_entries.py
+# Async versions of the /entries/ endpoints, used when DB_MODE=async (see database.py).
+# They run on the AsyncEngine, so waiting for the database doesn't hold a threadpool thread.
+# The database logic itself is shared with the sync handlers through crud.py.
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import pagination
+import serialization
+from database import get_async_db
+from users import get_user_id
+from schemas import CalorieEntryCreate, CalorieEntryResponse, CalorieEntryUpdate
+
+router = APIRouter()
+
+
+@router.post("/entries/", response_model=CalorieEntryResponse)
+async def create_calorie_entry(
+    entry: CalorieEntryCreate,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Creates a new calorie entry in the database.
+    If calories are not provided, attempts to auto-calculate from `food_data`.
+    """
+    final_calories = crud.resolve_calories(entry)
+    if final_calories is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Calories not provided and food name not found in database. Please provide calories manually."
+        )
+    return await db.run_sync(crud.create_entry, user_id, entry, final_calories)
+
+
+@router.delete("/entries/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_calorie_entry(
+    entry_id: int,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Deletes a calorie entry by its ID.
+    Returns 204 No Content on successful deletion, 404 if not found.
+    """
+    if not await db.run_sync(crud.delete_entry, user_id, entry_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found")
+    return {"message": "Entry deleted successfully"}
+
+
+@router.put("/entries/{entry_id}", response_model=CalorieEntryResponse)
+async def update_calorie_entry(
+    entry_id: int,
+    entry: CalorieEntryUpdate,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_entry = await db.run_sync(crud.update_entry, user_id, entry_id, entry)
+    if db_entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found")
+    return db_entry
+
+
+@router.get("/entries/", response_model=list[CalorieEntryResponse])
+async def read_calorie_entries(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    meal_type: Optional[str] = None,
+    stream: bool = False,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieves calorie entries, newest first. Same parameters as the sync handler in main.py.
+    """
+    try:
+        if stream:
+            if cursor is not None:
+                await db.run_sync(pagination.cursor_datetime, cursor)
+            # The export is read through the sync engine; StreamingResponse iterates it in the threadpool
+            return StreamingResponse(
+                serialization.stream_entries_json(
+                    crud.iter_entry_batches(user_id, cursor, before, date_from, date_to, meal_type)
+                ),
+                media_type="application/json",
+            )
+        rows, next_cursor = await db.run_sync(
+            crud.list_entries, user_id, limit, cursor, before, date_from, date_to, meal_type, skip
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    return serialization.entries_response(rows, headers)
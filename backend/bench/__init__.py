@@ -0,0 +1,11 @@
+# backend/bench/__init__.py
+"""
+Benchmark and load-test suite for the diet diary API.
+
+Run from the backend directory:
+    python -m bench.seed --db bench.db --entries 100000 --foods 300000 --catalog bench.fcat
+    python -m bench.run --db bench.db --catalog bench.fcat --json results.json
+    python -m bench.run --db bench.db --catalog bench.fcat --compare results.json
+    python -m bench.food_search --catalog bench.fcat
+    python -m bench.check_archive
+"""
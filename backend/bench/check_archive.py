@@ -0,0 +1,224 @@
+# backend/bench/check_archive.py
+"""
+Regression check for the schema upgrade and the entry archive, on a throwaway SQLite database.
+
+1. Creates a database with the schema of the previous release (entries without user_id,
+   daily_totals keyed by (day, meal_type)) and fills it, then lets the app upgrade it.
+   Checks that existing entries belong to the default user, that ids are AUTOINCREMENT,
+   that the indexes were replaced and that daily_totals was refilled.
+2. Adds entries of a second user and reads every page of GET /entries/ (cursor, `skip`,
+   date range, stream) and /stats/daily, archives old entries, and checks that every read
+   returns the same thing afterwards.
+
+    python -m bench.check_archive
+    python -m bench.check_archive --mode async --entries 20000
+
+Exits with an error on the first difference, leaving the database in a temporary directory.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Schema created by the release before per-user entries, as SQLAlchemy created it on SQLite
+BASELINE_SCHEMA = """
+CREATE TABLE calorie_entries (
+    id INTEGER NOT NULL,
+    food_name VARCHAR,
+    calories FLOAT,
+    meal_type VARCHAR,
+    consumed_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_calorie_entries_id ON calorie_entries (id);
+CREATE INDEX ix_calorie_entries_food_name ON calorie_entries (food_name);
+CREATE INDEX ix_calorie_entries_meal_type ON calorie_entries (meal_type);
+CREATE INDEX ix_calorie_entries_consumed_at_id ON calorie_entries (consumed_at, id);
+CREATE TABLE daily_totals (
+    day DATE NOT NULL,
+    meal_type VARCHAR NOT NULL,
+    calories FLOAT NOT NULL,
+    entry_count INTEGER NOT NULL,
+    PRIMARY KEY (day, meal_type)
+);
+"""
+
+MEAL_TYPES = ("Breakfast", "Lunch", "Dinner", "Snack")
+PAGE_SIZE = 137 # Not a divisor of the entry counts, so pages straddle partitions
+
+
+def fail(message: str) -> None:
+    sys.exit(f"FAILED: {message}")
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        fail(message)
+
+
+def random_entries(count: int, now: datetime, rng: random.Random) -> list:
+    # Spread over ~2.5 years, so about half the entries get archived, with some shared timestamps
+    entries = []
+    for i in range(count):
+        if entries and rng.random() < 0.02:
+            consumed_at = entries[-1][3]
+        else:
+            consumed_at = now - timedelta(days=rng.randint(0, 900), seconds=rng.randint(0, 86399))
+        entries.append((f"food {i % 50}", float(rng.randint(10, 900)), rng.choice(MEAL_TYPES), consumed_at))
+    return entries
+
+
+def create_baseline(path: str, entries: list) -> None:
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executemany(
+        "INSERT INTO calorie_entries (food_name, calories, meal_type, consumed_at) VALUES (?, ?, ?, ?)",
+        [(name, calories, meal, consumed_at.isoformat(" ")) for name, calories, meal, consumed_at in entries],
+    )
+    # Totals in the old layout; the upgrade recreates the table and refills it
+    connection.execute(
+        "INSERT INTO daily_totals SELECT date(consumed_at), meal_type, sum(calories), count(*) "
+        "FROM calorie_entries GROUP BY date(consumed_at), meal_type"
+    )
+    connection.commit()
+    connection.close()
+
+
+def check_upgrade(path: str, client, entries: list, default_user_id: int) -> None:
+    connection = sqlite3.connect(path)
+    owners = connection.execute("SELECT user_id, count(*) FROM calorie_entries GROUP BY user_id").fetchall()
+    check(owners == [(default_user_id, len(entries))], f"entries after the upgrade belong to {owners}")
+    table_sql = connection.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'calorie_entries'"
+    ).fetchone()[0]
+    check("AUTOINCREMENT" in table_sql.upper(), "calorie_entries.id is not AUTOINCREMENT after the upgrade")
+    indexes = {row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'calorie_entries'"
+    )}
+    check("ix_calorie_entries_user_id_consumed_at_id" in indexes, f"missing the user index, found {sorted(indexes)}")
+    check("ix_calorie_entries_consumed_at_id" not in indexes, "the obsolete index was not dropped")
+    total_columns = {row[1] for row in connection.execute("PRAGMA table_info(daily_totals)")}
+    check("user_id" in total_columns, "daily_totals has no user_id column after the upgrade")
+    connection.close()
+
+    expected = Counter()
+    for *_, consumed_at in entries:
+        expected[consumed_at.date().isoformat()] += 1
+    stats = client.get("/stats/daily").json()
+    check({day["date"]: day["entry_count"] for day in stats} == dict(expected), "daily_totals was not refilled")
+
+
+def read_all(client, headers: dict) -> dict:
+    """
+    Returns every read of the user's entries that must not change when entries are archived.
+    """
+    def cursor_pages(params: dict) -> list:
+        pages, cursor = [], None
+        while True:
+            page_params = dict(params, limit=PAGE_SIZE)
+            if cursor:
+                page_params["cursor"] = cursor
+            response = client.get("/entries/", params=page_params, headers=headers)
+            check(response.status_code == 200, f"GET /entries/ returned {response.status_code}: {response.text}")
+            pages.append(response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                return pages
+
+    def skip_pages() -> list:
+        pages, skip = [], 0
+        while True:
+            page = client.get("/entries/", params={"limit": PAGE_SIZE, "skip": skip}, headers=headers).json()
+            pages.append(page)
+            skip += PAGE_SIZE
+            if len(page) < PAGE_SIZE:
+                return pages
+
+    today = datetime.utcnow().date()
+    date_range = {"from": (today - timedelta(days=600)).isoformat(), "to": (today - timedelta(days=200)).isoformat()}
+    pages = cursor_pages({})
+    entries = [entry for page in pages for entry in page]
+    middle = entries[len(entries) // 2]
+    return {
+        "pages": pages,
+        "skip_pages": skip_pages(),
+        "range_pages": cursor_pages(date_range),
+        "meal_pages": cursor_pages({"meal_type": "Dinner"}),
+        "before_pages": cursor_pages({"before": middle["consumed_at"]}),
+        "stream": client.get("/entries/", params={"stream": "true"}, headers=headers).json(),
+        "stream_range": client.get("/entries/", params=dict(date_range, stream="true"), headers=headers).json(),
+        "stats": client.get("/stats/daily", headers=headers).json(),
+        "by_meal": client.get("/stats/by-meal", headers=headers).json(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the schema upgrade and that archiving doesn't change reads.")
+    parser.add_argument("--entries", type=int, default=5000, help="Entries per user")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="DB_MODE of the app")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated entries")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="check_archive_")
+    path = os.path.join(directory, "check.db")
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    legacy = random_entries(args.entries, now, rng)
+    create_baseline(path, legacy)
+
+    # The app reads its configuration when it is imported, so this must run before importing main
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["DB_MODE"] = args.mode
+    os.environ["CACHE_URL"] = "none"
+    from fastapi.testclient import TestClient
+
+    import archive
+    import database
+    import main
+    from users import DEFAULT_USER_ID
+
+    other_user = {"X-User-Id": str(DEFAULT_USER_ID + 1)}
+    with TestClient(main.app) as client:
+        check_upgrade(path, client, legacy, DEFAULT_USER_ID)
+        print(f"upgrade: {len(legacy)} entries moved to user {DEFAULT_USER_ID}, totals refilled")
+
+        body = "\n".join(
+            json.dumps({"food_name": name, "calories": calories, "meal_type": meal, "consumed_at": consumed_at.isoformat()})
+            for name, calories, meal, consumed_at in random_entries(args.entries, now, rng)
+        )
+        response = client.post("/entries/bulk", content=body, headers={**other_user, "Content-Type": "application/x-ndjson"})
+        check(response.status_code in (200, 201), f"POST /entries/bulk returned {response.status_code}: {response.text}")
+
+        users = {DEFAULT_USER_ID: {}, DEFAULT_USER_ID + 1: other_user}
+        before = {user_id: read_all(client, headers) for user_id, headers in users.items()}
+        for user_id, reads in before.items():
+            count = sum(len(page) for page in reads["pages"])
+            check(count == args.entries, f"user {user_id} has {count} entries, expected {args.entries}")
+            check(reads["stream"] == [entry for page in reads["pages"] for entry in page], "stream differs from the pages")
+
+        with database.SessionLocal() as db:
+            moved = archive.archive_entries(db, archive.horizon())
+        check(sum(moved.values()) > 0, "nothing was archived")
+        print(f"archive: {sum(moved.values())} entries moved into {len(moved)} partitions")
+
+        for user_id, headers in users.items():
+            after = read_all(client, headers)
+            for name, expected in before[user_id].items():
+                check(after[name] == expected, f"{name} of user {user_id} differs after archiving")
+        print(f"reads: same pages, streams and stats for {len(users)} users before and after archiving")
+
+        # Decodes, but its timestamp doesn't parse: must fail before a streamed response starts
+        garbage = base64.urlsafe_b64encode(b'["garbage", 1]').decode()
+        for params in ({"cursor": garbage}, {"cursor": garbage, "stream": "true"}):
+            status = client.get("/entries/", params=params).status_code
+            check(status == 400, f"a malformed cursor with {params} returned {status}")
+    database.engine.dispose()
+    shutil.rmtree(directory)
+    print("OK")
@@ -0,0 +1,84 @@
+# backend/bench/food_search.py
+"""
+Measures FoodIndex.search directly (no HTTP) on a catalog file, per kind of query,
+and fails when a percentile goes over the latency budget.
+
+    python -m bench.seed --db bench.db --entries 0 --foods 300000 --catalog bench.fcat
+    python -m bench.food_search --catalog bench.fcat --max-p50-ms 5 --max-p99-ms 20
+"""
+import argparse
+import random
+import sys
+import time
+
+import food_catalog
+import food_search
+from bench.run import percentile
+
+
+def queries(catalog, count: int, rng: random.Random) -> dict:
+    """
+    Returns {kind: [(query, expected name or None)]} built from names in the catalog.
+    """
+    names = [catalog.name(rng.randrange(len(catalog))) for _ in range(count)]
+
+    def typo(name: str) -> str:
+        position = rng.randrange(len(name))
+        return name[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[position + 1:]
+
+    return {
+        "exact": [(name, name) for name in names],
+        "prefix": [(name[:rng.randint(2, 6)], None) for name in names],
+        "word_prefix": [(name.split(" ")[-1][:4], None) for name in names if " " in name],
+        "typo": [(typo(name), name) for name in names],
+        "no_match": [("".join(rng.choices("qxzjv", k=rng.randint(4, 12))), None) for _ in names],
+    }
+
+
+def run(index, cases, limit: int) -> dict:
+    latencies = []
+    found = 0
+    for query, expected in cases:
+        started = time.perf_counter()
+        results = index.search(query, limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if expected is not None and any(result["name"] == expected for result in results):
+            found += 1
+    latencies.sort()
+    expected_count = sum(expected is not None for _, expected in cases)
+    return {
+        "queries": len(cases),
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "recall": found / expected_count if expected_count else None, # Expected name among the results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark food search latency on a catalog file.")
+    parser.add_argument("--catalog", required=True, help="Food catalog file (see bench.seed --foods)")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per kind")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the queries")
+    parser.add_argument("--max-p50-ms", type=float, help="Fail if any kind's p50 is above this")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if any kind's p99 is above this")
+    args = parser.parse_args()
+
+    catalog = food_catalog.FoodCatalog.open(args.catalog)
+    index = food_search.FoodIndex(catalog)
+    rng = random.Random(args.seed)
+    failed = []
+    print(f"{len(catalog)} foods")
+    print(f"{'kind':<12} {'queries':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'recall':>7}")
+    for kind, cases in queries(catalog, args.queries, rng).items():
+        result = run(index, cases, args.limit)
+        recall = f"{result['recall']:.0%}" if result["recall"] is not None else "-"
+        print(f"{kind:<12} {result['queries']:>7} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} "
+              f"{result['max_ms']:>8.3f} {recall:>7}")
+        if args.max_p50_ms is not None and result["p50_ms"] > args.max_p50_ms:
+            failed.append(f"{kind} p50 {result['p50_ms']:.3f} ms > {args.max_p50_ms} ms")
+        if args.max_p99_ms is not None and result["p99_ms"] > args.max_p99_ms:
+            failed.append(f"{kind} p99 {result['p99_ms']:.3f} ms > {args.max_p99_ms} ms")
+    if failed:
+        sys.exit("Over the latency budget: " + "; ".join(failed))
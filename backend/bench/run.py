@@ -0,0 +1,263 @@
+# backend/bench/run.py
+"""
+Drives the real FastAPI app in-process (httpx ASGI transport) against a seeded database
+and reports latency percentiles, throughput and SQL statements per request.
+
+    python -m bench.run --db bench.db --requests 500 --concurrency 8
+    python -m bench.run --db bench.db --mode async --cache --scenarios list,create
+    python -m bench.run --db bench.db --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# (name, description) of every scenario, in the order they run
+SCENARIOS = (
+    ("list", "GET /entries/, first page"),
+    ("list_deep_cursor", "GET /entries/, page deep in the history through `before`"),
+    ("list_deep_skip", "GET /entries/, same depth through the legacy `skip` offset"),
+    ("list_day", "GET /entries/ for one day (from/to)"),
+    ("stats_daily", "GET /stats/daily for the last 30 days"),
+    ("create", "POST /entries/"),
+    ("update", "PUT /entries/{id}"),
+    ("delete", "DELETE /entries/{id}"),
+    ("food_suggestions", "GET /food-suggestions/"),
+    ("food_search", "GET /foods/search"),
+)
+
+
+def configure_environment(args) -> None:
+    # The app reads its configuration when it is imported, so this must run before importing main
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ["DB_MODE"] = args.mode
+    os.environ["CACHE_URL"] = "memory://" if args.cache else "none"
+    os.environ["PROFILE_REQUESTS"] = "1"
+    os.environ.setdefault("PROFILE_SLOW_MS", "1e9") # Only the numbers in the response headers are needed
+    if args.catalog:
+        os.environ["FOOD_CATALOG_PATH"] = args.catalog
+
+
+def dataset_info(db_path: str) -> dict:
+    # Requests act for the default user (1). Read from daily_totals, which also counts archived entries.
+    connection = sqlite3.connect(db_path)
+    count, first, last = connection.execute(
+        "SELECT sum(entry_count), min(day), max(day) FROM daily_totals WHERE user_id = 1"
+    ).fetchone()
+    entry_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM calorie_entries WHERE user_id = 1 ORDER BY random() LIMIT 1000"
+    )]
+    connection.close()
+    if not count:
+        raise SystemExit(f"{db_path} has no entries of user 1, seed it first with `python -m bench.seed`")
+    return {
+        "entries": count,
+        "entry_ids": entry_ids, # Entries updated by the 'update' scenario
+        "first": datetime.fromisoformat(first),
+        "last": datetime.combine(date.fromisoformat(last), datetime.max.time()),
+    }
+
+
+class Scenario:
+    def __init__(self, name: str, data: dict, rng: random.Random):
+        self.name = name
+        self.data = data
+        self.rng = rng
+        self.created_ids = []
+
+    async def setup(self, client, requests: int) -> None:
+        if self.name == "delete":
+            # Delete entries created here, so the seeded data stays the same between runs
+            for _ in range(requests):
+                response = await client.post("/entries/", json={"food_name": "bench", "calories": 1, "meal_type": "Snacks"})
+                self.created_ids.append(response.json()["id"])
+
+    def record(self, response) -> None:
+        # Entries added by 'create' are deleted again in teardown, for the same reason
+        if self.name == "create" and response.status_code < 400:
+            self.created_ids.append(response.json()["id"])
+
+    async def teardown(self, client) -> None:
+        if self.name == "create":
+            while self.created_ids:
+                await client.delete(f"/entries/{self.created_ids.pop()}")
+
+    def request(self):
+        """
+        Returns (method, url, json body) of the next request.
+        """
+        data, rng = self.data, self.rng
+        depth = data["first"] + (data["last"] - data["first"]) * 0.1 # 90% of the history is newer
+        if self.name == "list":
+            return "GET", "/entries/?limit=100", None
+        if self.name == "list_deep_cursor":
+            return "GET", f"/entries/?limit=100&before={depth.isoformat()}", None
+        if self.name == "list_deep_skip":
+            return "GET", f"/entries/?limit=100&skip={int(data['entries'] * 0.9)}", None
+        if self.name == "list_day":
+            day = (data["first"] + (data["last"] - data["first"]) * rng.random()).date()
+            return "GET", f"/entries/?from={day}&to={day}", None
+        if self.name == "stats_daily":
+            last_day = data["last"].date()
+            return "GET", f"/stats/daily?from={last_day - timedelta(days=30)}&to={last_day}", None
+        if self.name == "create":
+            return "POST", "/entries/", {"food_name": "apple", "meal_type": rng.choice(("Breakfast", "Lunch", "Dinner", "Snacks"))}
+        if self.name == "update":
+            return "PUT", f"/entries/{rng.choice(data['entry_ids'])}", {"calories": rng.randint(1, 900)}
+        if self.name == "delete":
+            return "DELETE", f"/entries/{self.created_ids.pop()}", None
+        if self.name == "food_suggestions":
+            return "GET", "/food-suggestions/", None
+        if self.name == "food_search":
+            return "GET", f"/foods/search?q={rng.choice('abcdefghiklmnoprstuy')}{rng.choice('aeiou')}&limit=10", None
+        raise ValueError(self.name)
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int, warmup: int) -> dict:
+    await scenario.setup(client, requests + warmup)
+    for _ in range(warmup):
+        method, url, body = scenario.request()
+        scenario.record(await client.request(method, url, json=body))
+
+    latencies, sql_counts, db_ms = [], [], []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, body = scenario.request()
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            await response.aread()
+            latencies.append((time.perf_counter() - started) * 1000)
+            scenario.record(response)
+            if response.status_code >= 400:
+                errors += 1
+            sql_counts.append(int(response.headers.get("x-sql-count", 0)))
+            timing = dict(
+                part.strip().split(";dur=") for part in response.headers.get("server-timing", "").split(",") if ";dur=" in part
+            )
+            db_ms.append(float(timing.get("db", 0)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await scenario.teardown(client)
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "sql_per_request": sum(sql_counts) / len(sql_counts) if sql_counts else 0.0,
+        "db_ms_per_request": sum(db_ms) / len(db_ms) if db_ms else 0.0,
+    }
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    header = f"{'scenario':<18} {'req':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'SQL/req':>8} {'db ms':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        line = (
+            f"{name:<18} {result['requests']:>6} {result['errors']:>4} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['throughput_rps']:>9.1f} "
+            f"{result['sql_per_request']:>8.1f} {result['db_ms_per_request']:>7.2f}"
+        )
+        before = (baseline or {}).get(name)
+        if before:
+            def change(key):
+                return (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            line += f"   p50 {change('p50_ms'):+.0f}%  p95 {change('p95_ms'):+.0f}%  req/s {change('throughput_rps'):+.0f}%"
+        print(line)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(args) -> dict:
+    configure_environment(args)
+    import httpx
+    import main as app_module
+
+    data = dataset_info(args.db)
+    names = [name for name, _ in SCENARIOS]
+    if args.scenarios:
+        names = [name for name in args.scenarios.split(",") if name]
+        unknown = set(names) - {name for name, _ in SCENARIOS}
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app_module.app)
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in names:
+                results[name] = await run_scenario(client, Scenario(name, data, rng), args.requests, args.concurrency, args.warmup)
+    finally:
+        # ASGITransport doesn't run the app's lifespan, so close the connection pools here
+        import database
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+        database.engine.dispose()
+    return {
+        "commit": git_commit(),
+        "mode": args.mode,
+        "cache": args.cache,
+        "entries": data["entries"],
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the diet diary API in-process.")
+    parser.add_argument("--db", default="bench.db", help="Seeded SQLite database (see bench.seed)")
+    parser.add_argument("--catalog", help="Food catalog file to serve foods from")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="DB_MODE of the app")
+    parser.add_argument("--cache", action="store_true", help="Enable the response cache")
+    parser.add_argument("--scenarios", help="Comma-separated scenarios to run: " + ", ".join(name for name, _ in SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at the same time")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for request parameters")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+    print(f"commit {report['commit']}, {report['entries']} entries, mode {report['mode']}, "
+          f"cache {'on' if report['cache'] else 'off'}, concurrency {report['concurrency']}", file=sys.stderr)
+    print_results(report["results"], baseline)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
@@ -0,0 +1,126 @@
+# backend/bench/seed.py
+"""
+Creates a SQLite database (and optionally a food catalog file) filled with generated data.
+
+    python -m bench.seed --db bench.db --entries 1000000 --days 1095 --users 100
+    python -m bench.seed --db bench.db --entries 0 --foods 300000 --catalog bench.fcat
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import daily_totals
+import food_catalog
+import food_data
+import models
+
+MEAL_TYPES = ("Breakfast", "Lunch", "Dinner", "Snacks")
+SYLLABLES = (
+    "ap", "ple", "ba", "na", "or", "ange", "chick", "en", "ri", "ce", "bre", "ad", "egg", "mil", "yo",
+    "gurt", "sal", "mon", "broc", "co", "li", "po", "ta", "to", "car", "rot", "be", "an", "pea", "nut",
+)
+QUALIFIERS = ("raw", "boiled", "fried", "baked", "grilled", "canned", "frozen", "dried", "fresh", "smoked")
+UNITS = ("100g", "1 cup", "1 medium", "1 slice", "1 tbsp", "1 piece")
+
+
+def food_names(count: int, rng: random.Random):
+    """
+    Generates `count` plausible, mostly unique food names.
+    """
+    for _ in range(count):
+        words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.5:
+            words.append(rng.choice(QUALIFIERS))
+        yield " ".join(words)
+
+
+def seed_catalog(path: str, foods: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    rows = (
+        (name, {"calories": float(rng.randint(5, 900)), "unit": rng.choice(UNITS)})
+        for name in food_names(foods, rng)
+    )
+    food_catalog.write(path, food_catalog.build(rows))
+
+
+def seed_entries(db_path: str, entries: int, days: int, catalog_path: str = None, seed: int = 0,
+                 users: int = 1, batch_size: int = 50000) -> None:
+    """
+    Creates the schema and inserts `entries` entries spread over the last `days` days,
+    owned by users 1 to `users` (user 1 is the one the benchmark requests act for).
+    Rows are written with plain sqlite3 executemany, which is much faster than the ORM
+    for millions of rows; daily_totals is rebuilt afterwards.
+    """
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(engine)
+
+    rng = random.Random(seed)
+    if catalog_path:
+        catalog = food_catalog.FoodCatalog.open(catalog_path)
+        foods = [catalog.name(rng.randrange(len(catalog))) for _ in range(min(len(catalog), 1000))]
+        calories = [catalog.info(catalog.find(name))["calories"] for name in foods]
+    else:
+        foods = list(food_data.FOOD_CALORIES)
+        calories = [food_data.FOOD_CALORIES[name]["calories"] for name in foods]
+
+    end = datetime.utcnow()
+    span_seconds = days * 24 * 3600
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA synchronous=OFF") # Seeding only: the data is disposable
+    inserted = 0
+    while inserted < entries:
+        count = min(batch_size, entries - inserted)
+        rows = []
+        for _ in range(count):
+            food = rng.randrange(len(foods))
+            consumed_at = end - timedelta(seconds=rng.randrange(span_seconds))
+            rows.append((
+                rng.randint(1, users), foods[food], calories[food], rng.choice(MEAL_TYPES),
+                consumed_at.isoformat(sep=" "),
+            ))
+        connection.executemany(
+            "INSERT INTO calorie_entries (user_id, food_name, calories, meal_type, consumed_at) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        connection.commit()
+        inserted += count
+    connection.close()
+
+    with Session(engine) as db:
+        daily_totals.rebuild(db)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a benchmark database and food catalog.")
+    parser.add_argument("--db", default="bench.db", help="SQLite database file to create")
+    parser.add_argument("--entries", type=int, default=10000, help="Number of entries (e.g. 10000 to 10000000)")
+    parser.add_argument("--days", type=int, default=3 * 365, help="Spread entries over this many past days")
+    parser.add_argument("--users", type=int, default=1, help="Spread entries over this many users")
+    parser.add_argument("--foods", type=int, default=0, help="Generate a catalog with this many foods")
+    parser.add_argument("--catalog", help="Catalog file to write (with --foods) or to take food names from")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data")
+    parser.add_argument("--force", action="store_true", help="Replace an existing database file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} already exists, use --force to replace it")
+        for path in (args.db, args.db + "-wal", args.db + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    started = time.perf_counter()
+    if args.foods:
+        if not args.catalog:
+            parser.error("--foods needs --catalog")
+        seed_catalog(args.catalog, args.foods, args.seed)
+        print(f"Wrote {args.foods} generated foods to {args.catalog}")
+    seed_entries(args.db, args.entries, args.days, args.catalog, args.seed, args.users)
+    print(f"Seeded {args.entries} entries into {args.db} in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,201 @@
+# backend/bulk_import.py
+import codecs
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import cache
+import daily_totals
+import food_data
+import models
+
+# Rows are inserted in chunks of this size, one transaction per chunk.
+# Memory use of an import is bounded by the chunk size, not by the size of the upload.
+DEFAULT_CHUNK_SIZE = 5000
+
+# Only the first errors are reported back, so a completely broken file can't blow up the response.
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportRow(BaseModel):
+    food_name: str
+    calories: Optional[float] = None
+    meal_type: str
+    consumed_at: Optional[datetime] = None
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, row: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"inserted": self.inserted, "failed": self.failed, "errors": self.errors}
+
+
+def _utc_naive(value: Optional[datetime]) -> datetime:
+    # consumed_at is stored as naive UTC, like the CURRENT_TIMESTAMP default of single inserts
+    if value is None:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_db_row(data: Any, user_id: int) -> Dict[str, Any]:
+    """
+    Validates one raw row of the user's import and resolves its calories.
+    Raises ValueError with a readable message if the row can't be imported.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Row must be an object")
+    try:
+        row = ImportRow.model_validate(data)
+    except ValidationError as exc:
+        raise ValueError("; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()))
+
+    calories = row.calories
+    if calories is None:
+        calories = food_data.get_calories_by_food_name(row.food_name)
+        if calories is None:
+            raise ValueError("Calories not provided and food name not found in database.")
+
+    return {
+        "user_id": user_id,
+        "food_name": row.food_name,
+        "calories": calories,
+        "meal_type": row.meal_type,
+        "consumed_at": _utc_naive(row.consumed_at),
+    }
+
+
+def insert_chunk(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts a chunk of validated rows with one executemany INSERT and updates the
+    daily totals, all in one transaction.
+    """
+    if not rows:
+        return
+    totals: Dict[Tuple[int, Any, str], List[float]] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        bucket = totals[(row["user_id"], row["consumed_at"].date(), row["meal_type"])]
+        bucket[0] += row["calories"]
+        bucket[1] += 1
+    try:
+        db.execute(insert(models.CalorieEntry), rows)
+        for (user_id, day, meal_type), (calories, count) in totals.items():
+            daily_totals.apply_delta(db, user_id, day, meal_type, calories, count)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    days_by_user = defaultdict(set)
+    for user_id, day, _ in totals:
+        days_by_user[user_id].add(day)
+    for user_id, days in days_by_user.items():
+        cache.invalidate_entries(user_id, days)
+
+
+## Body parsers
+# Each parser yields (row_number, raw_row) pairs; row numbers start at 1.
+# A raw row is a dict, or an Exception if that row could not even be parsed.
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        if first and len(buffer) < len(codecs.BOM_UTF8):
+            continue # Not enough bytes yet to tell whether the body starts with a BOM
+        if first:
+            # Excel and many trackers start their exports with a UTF-8 byte order mark
+            buffer = buffer.removeprefix(codecs.BOM_UTF8)
+            first = False
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if first:
+        buffer = buffer.removeprefix(codecs.BOM_UTF8)
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]):
+    number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    # A quoted field may span lines: lines are collected until the quotes are balanced
+    # (an escaped quote is written twice, so it doesn't change the balance).
+    record: List[str] = []
+    quotes = 0
+    async for line in iter_lines(chunks):
+        if not record and not line.strip():
+            continue
+        record.append(line + "\n") # iter_lines strips the line ending, which is part of a multi-line field
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield next(csv.reader(record))
+            record, quotes = [], 0
+    if record:
+        yield next(csv.reader(record)) # Unterminated quote: the rest of the body is one field
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]):
+    header = None
+    number = 0
+    async for fields in iter_csv_records(chunks):
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        number += 1
+        if len(fields) != len(header):
+            yield number, ValueError(f"Expected {len(header)} columns, got {len(fields)}")
+            continue
+        # Empty cells mean "not provided", e.g. an empty calories column
+        yield number, {name: value for name, value in zip(header, fields) if value != ""}
+
+
+async def parse_json_array(chunks: AsyncIterator[bytes]):
+    # A JSON array has to be read completely before it can be parsed;
+    # use NDJSON or CSV for large imports.
+    body = b"".join([chunk async for chunk in chunks])
+    try:
+        data = json.loads(body)
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON: {exc}")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of entries")
+    for number, item in enumerate(data, start=1):
+        yield number, item
+
+
+def parser_for(content_type: str):
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return parse_ndjson
+    if content_type in ("text/csv", "application/csv"):
+        return parse_csv
+    if content_type in ("application/json", ""):
+        return parse_json_array
+    return None
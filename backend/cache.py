@@ -0,0 +1,194 @@
+# backend/cache.py
+"""
+Response cache for the read endpoints, with ETags and write-driven invalidation.
+
+Cached responses are keyed by user, path, query string and the *versions* of the data they
+depend on. Entry data is versioned per user and calendar month: every committed write bumps
+the version of the month it touched (plus a global version of that user), so the next read
+of that range gets a new key and is recomputed, while cached reads of other months and of
+other users stay valid. Archiving entries doesn't change any response, so it bumps nothing.
+Nothing is ever served from an outdated version, the TTL only bounds memory use.
+
+Backends are chosen with CACHE_URL:
+- memory:// (default): in-process LRU. Versions are per process, so use it with one worker.
+- redis://host:port/db: shared by all workers (any Redis-compatible server).
+- none: caching disabled.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300")) # Seconds
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# Date ranges longer than this depend on the global version instead of one version per month
+MAX_VERSIONED_MONTHS = 24
+
+
+
+class MemoryBackend:
+    """
+    In-process LRU cache with a TTL per entry, safe to use from the threadpool.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get_counters(self, names: List[str]) -> List[int]:
+        with self._lock:
+            return [self._counters.get(name, 0) for name in names]
+
+    def incr(self, names: Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                self._counters[name] = self._counters.get(name, 0) + 1
+
+
+class RedisBackend:
+    """
+    Cache stored in Redis, so all workers share cached responses and versions.
+    Needs the optional 'redis' package.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL is a Redis URL, but the 'redis' package is not installed.")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._client.set(key, value, ex=ttl)
+
+    def get_counters(self, names: List[str]) -> List[int]:
+        return [int(value or 0) for value in self._client.mget(names)]
+
+    def incr(self, names: Iterable[str]) -> None:
+        pipeline = self._client.pipeline()
+        for name in names:
+            pipeline.incr(name)
+        pipeline.execute()
+
+
+def _create_backend(url: str):
+    if url in ("", "none"):
+        return None
+    if url.startswith("memory:"):
+        return MemoryBackend()
+    if url.startswith(("redis:", "rediss:")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+backend = _create_backend(CACHE_URL)
+
+# Remote backends do network I/O, so async code should call them from the threadpool
+is_remote = isinstance(backend, RedisBackend)
+
+
+def _global_key(user_id: int) -> str:
+    return f"v:entries:{user_id}"
+
+
+def _month_key(user_id: int, day: date) -> str:
+    return f"v:entries:{user_id}:{day.year:04d}-{day.month:02d}"
+
+
+def _months(date_from: date, date_to: date) -> List[date]:
+    months = []
+    current = date_from.replace(day=1)
+    while current <= date_to:
+        months.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def entry_versions(user_id: int, date_from: Optional[date], date_to: Optional[date]) -> str:
+    """
+    Returns the version string of the user's entry data in a date range, used in cache keys.
+    """
+    if backend is None:
+        return ""
+    names = [_global_key(user_id)]
+    if date_from is not None and date_to is not None and date_from <= date_to:
+        months = _months(date_from, date_to)
+        if len(months) <= MAX_VERSIONED_MONTHS:
+            names = [_month_key(user_id, month) for month in months]
+    return ".".join(map(str, backend.get_counters(names)))
+
+
+def invalidate_entries(user_id: int, days: Iterable[date]) -> None:
+    """
+    Marks cached reads of the user's entries in the months containing `days`
+    (and of unbounded ranges) as outdated. Call it after the write is committed.
+    """
+    if backend is None:
+        return
+    names = {_month_key(user_id, day) for day in days}
+    names.add(_global_key(user_id))
+    backend.incr(sorted(names))
+
+
+def etag(body: bytes) -> str:
+    # Strong ETag: identical bodies, byte for byte, have identical tags
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return tag in (candidate.strip() for candidate in if_none_match.split(","))
+
+
+def get_response(key: str):
+    """
+    Returns (status_code, headers, body) of a cached response, or None.
+    """
+    if backend is None:
+        return None
+    raw = backend.get(key)
+    if raw is None:
+        return None
+    meta, body = raw.split(b"\n", 1)
+    status_code, headers = json.loads(meta)
+    return status_code, headers, body
+
+
+def set_response(key: str, status_code: int, headers: dict, body: bytes) -> None:
+    if backend is None:
+        return
+    meta = json.dumps([status_code, headers]).encode()
+    backend.set(key, meta + b"\n" + body, CACHE_TTL)
@@ -0,0 +1,259 @@
+# backend/crud.py
+# Database operations on calorie entries, shared by the sync handlers in main.py
+# and the async handlers in async_entries.py (which call them through AsyncSession.run_sync).
+from datetime import date, datetime, time
+from itertools import islice
+from typing import Optional
+
+from sqlalchemy import Table, and_, delete, select, union_all, update
+from sqlalchemy.orm import Session
+
+import archive
+import cache
+import daily_totals
+import database
+import food_data
+import models
+import pagination
+from schemas import CalorieEntryCreate, CalorieEntryUpdate
+
+
+# Columns returned by the entry list endpoints.
+# Selecting plain columns returns lightweight rows: no ORM objects, no identity map.
+ENTRY_COLUMNS = ("id", "food_name", "calories", "meal_type", "consumed_at")
+
+# Rows fetched per round trip when streaming a full export
+STREAM_BATCH_SIZE = 1000
+
+
+def resolve_calories(entry: CalorieEntryCreate) -> Optional[float]:
+    """
+    Returns the calories given by the user, or looks them up in the food catalog.
+    Returns None if neither is available.
+    """
+    if entry.calories is not None:
+        return entry.calories
+    return food_data.get_calories_by_food_name(entry.food_name)
+
+
+def _lock_entry(db: Session, user_id: int, entry_id: int) -> Optional[models.CalorieEntry]:
+    """
+    Returns the user's entry with this id, or None (also when it belongs to another user).
+    The entry is read after taking the write lock on it, so it can't change until commit and
+    its values are the ones to take out of the daily totals, even when two requests change it at once.
+    An archived entry is moved back into the hot table, so it can be changed like any other.
+    """
+    hot = models.CalorieEntry.__table__
+    where = and_(hot.c.id == entry_id, hot.c.user_id == user_id)
+    # A no-op UPDATE takes the lock: the database write lock on SQLite, the row lock on PostgreSQL
+    locked = db.execute(update(hot).where(where).values(id=hot.c.id)).rowcount
+    if not locked and archive.restore_entry(db, user_id, entry_id) is None:
+        return None
+    stmt = select(models.CalorieEntry).where(where).execution_options(populate_existing=True)
+    return db.execute(stmt).scalar_one()
+
+
+def create_entry(db: Session, user_id: int, entry: CalorieEntryCreate, calories: float) -> models.CalorieEntry:
+    db_entry = models.CalorieEntry(
+        user_id=user_id, food_name=entry.food_name, calories=calories, meal_type=entry.meal_type
+    )
+    db.add(db_entry)  # Add the new entry object to the session
+    db.flush()        # Send the INSERT so 'consumed_at' is known before updating the daily totals
+    daily_totals.add_entry(db, db_entry)
+    db.commit()       # Commit the entry and its daily total together
+    db.refresh(db_entry) # Refresh the object to get any database-generated values (like 'id', 'consumed_at')
+    cache.invalidate_entries(user_id, [db_entry.consumed_at.date()])
+    return db_entry
+
+
+def update_entry(
+    db: Session, user_id: int, entry_id: int, entry: CalorieEntryUpdate
+) -> Optional[models.CalorieEntry]:
+    """
+    Updates the user's entry and its daily totals. Returns None if the user has no such entry.
+    """
+    db_entry = _lock_entry(db, user_id, entry_id)
+    if db_entry is None:
+        db.rollback() # Release the lock
+        return None
+    # Take the old values out of the daily totals, then add the new ones back in
+    daily_totals.remove_entry(db, db_entry)
+    if entry.food_name is not None:
+        db_entry.food_name = entry.food_name
+    if entry.calories is not None:
+        db_entry.calories = entry.calories
+    if entry.meal_type is not None:
+        db_entry.meal_type = entry.meal_type
+    daily_totals.add_entry(db, db_entry)
+    db.commit()
+    db.refresh(db_entry)
+    cache.invalidate_entries(db_entry.user_id, [db_entry.consumed_at.date()])
+    return db_entry
+
+
+def delete_entry(db: Session, user_id: int, entry_id: int) -> bool:
+    """
+    Deletes the user's entry and takes it out of the daily totals.
+    Returns False if the user has no such entry (e.g. it was deleted by a concurrent request).
+    """
+    hot = models.CalorieEntry.__table__
+    # The totals are updated with the row the DELETE removed, so a repeated delete changes nothing
+    stmt = (
+        delete(hot)
+        .where(hot.c.id == entry_id, hot.c.user_id == user_id)
+        .returning(hot.c.calories, hot.c.meal_type, hot.c.consumed_at)
+    )
+    row = db.execute(stmt).first()
+    if row is None and archive.restore_entry(db, user_id, entry_id) is not None:
+        row = db.execute(stmt).first()
+    if row is None:
+        db.rollback()
+        return False
+    daily_totals.apply_delta(db, user_id, row.consumed_at.date(), row.meal_type, -row.calories, -1)
+    db.commit()
+    cache.invalidate_entries(user_id, [row.consumed_at.date()])
+    return True
+
+
+def _entries_query(
+    db: Session,
+    table: Table,
+    user_id: int,
+    cursor: Optional[str],
+    before: Optional[datetime],
+    date_from: Optional[date],
+    date_to: Optional[date],
+    meal_type: Optional[str],
+):
+    stmt = select(*(table.c[name] for name in ENTRY_COLUMNS))
+    stmt = pagination.filter_entries(db, stmt, user_id, date_from, date_to, meal_type, table=table)
+    return pagination.keyset_order(db, stmt, cursor, before, table=table)
+
+
+def _archive_partitions(
+    db: Session,
+    cursor: Optional[str],
+    before: Optional[datetime],
+    date_from: Optional[date],
+    date_to: Optional[date],
+):
+    # Only the months that can hold rows of this page: in the date range, and before the cursor
+    until = pagination.cursor_datetime(db, cursor) if cursor is not None else before
+    if until is not None:
+        until = pagination.utc_naive(until)
+    if until is not None and (date_to is None or until.date() < date_to):
+        date_to = until.date()
+    return archive.partition_tables(db, date_from, date_to)
+
+
+def list_entries(
+    db: Session,
+    user_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    meal_type: Optional[str] = None,
+    skip: int = 0,
+):
+    """
+    Returns one page of the user's entry rows (see ENTRY_COLUMNS), newest first, and the
+    cursor of the next page (None on the last page). Rows come from the hot table and
+    from the archive partitions the range overlaps (see archive.py).
+    `skip` is the legacy offset and is only used when neither `cursor` nor `before` is given.
+    Raises pagination.InvalidCursor for a malformed cursor.
+    """
+    if cursor is not None or before is not None:
+        skip = 0
+    hot = _entries_query(db, models.CalorieEntry.__table__, user_id, cursor, before, date_from, date_to, meal_type)
+    if skip:
+        # No hot read before the lookup here: the deep offset scan would be thrown away when
+        # there are partitions, and offsets aren't stable under concurrent writes anyway.
+        partitions = _archive_partitions(db, None, None, date_from, date_to)
+        if not partitions:
+            return pagination.page(db, db.execute(hot.offset(skip).limit(limit + 1)).all(), limit)
+        # Turn the legacy offset into a cursor, then read the page like any other
+        cursor = _cursor_at(db, partitions, user_id, skip, date_from, date_to, meal_type)
+        if cursor is None:
+            return [], None
+        return list_entries(db, user_id, limit, cursor, None, date_from, date_to, meal_type)
+
+    rows = db.execute(hot.limit(limit + 1)).all()
+    # The partitions are looked up after the hot table was read: an entry moved by a
+    # concurrent archive run is then read twice (and merged once) instead of missed.
+    partitions = _archive_partitions(db, cursor, before, date_from, date_to)
+    if not partitions:
+        return pagination.page(db, rows, limit)
+
+    results = [rows]
+    found = 0 # Rows known to be newer than the next partition
+    newer_hot = 0
+    for table in partitions:
+        # Each partition holds one month and they come newest first, so once enough rows
+        # are newer than this month, neither it nor any older partition can be in the page.
+        month_end = pagination.timestamp_value(db, datetime.combine(archive.next_month(table.info["month"]), time.min))
+        while newer_hot < len(rows) and rows[newer_hot].cursor_key >= month_end:
+            newer_hot += 1
+        if found + newer_hot > limit:
+            break
+        result = db.execute(
+            _entries_query(db, table, user_id, cursor, before, date_from, date_to, meal_type).limit(limit + 1)
+        ).all()
+        results.append(result)
+        found += len(result)
+    rows = list(islice(pagination.merge_rows(results), limit + 1))
+    return pagination.page(db, rows, limit)
+
+
+def _cursor_at(
+    db: Session,
+    partitions: list,
+    user_id: int,
+    skip: int,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    meal_type: Optional[str],
+) -> Optional[str]:
+    # Cursor of the row just before position `skip` of the merged hot and archived rows,
+    # or None if there are no more rows. Only keys are read, the database merges them.
+    keys = union_all(*(
+        _entries_query(db, table, user_id, None, None, date_from, date_to, meal_type)
+        .with_only_columns(table.c.id, pagination.timestamp_column(db, table).label("cursor_key"))
+        .order_by(None)
+        for table in [models.CalorieEntry.__table__] + partitions
+    )).subquery()
+    row = db.execute(
+        select(keys).order_by(keys.c.cursor_key.desc(), keys.c.id.desc()).offset(skip - 1).limit(1)
+    ).first()
+    return pagination.encode_cursor(db, row.cursor_key, row.id) if row is not None else None
+
+
+def iter_entry_batches(
+    user_id: int,
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    meal_type: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+):
+    """
+    Yields all of the user's matching entry rows, hot and archived, newest first,
+    in batches of `batch_size`.
+    Opens its own session because it runs while the response is being sent,
+    after the request's session may already be closed.
+    """
+    with database.SessionLocal() as db:
+        def stream(table):
+            stmt = _entries_query(db, table, user_id, cursor, before, date_from, date_to, meal_type)
+            return db.execute(stmt, execution_options={"stream_results": True})
+
+        hot = stream(models.CalorieEntry.__table__)
+        partitions = _archive_partitions(db, cursor, before, date_from, date_to)
+        if not partitions:
+            yield from hot.partitions(batch_size)
+            return
+        rows = pagination.merge_rows([hot] + [stream(table) for table in partitions])
+        while batch := list(islice(rows, batch_size)):
+            yield batch
@@ -0,0 +1,142 @@
+# backend/daily_totals.py
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, select, delete, insert, union_all
+from sqlalchemy.orm import Session
+
+import archive
+import models
+
+
+def _upsert_statement(db: Session):
+    # Both SQLite and PostgreSQL support INSERT ... ON CONFLICT DO UPDATE,
+    # but SQLAlchemy exposes it through the dialect-specific insert() construct.
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(models.DailyTotal)
+
+
+def apply_delta(db: Session, user_id: int, day: date, meal_type: str, calories: float, count: int) -> None:
+    """
+    Adds `calories` and `count` to the user's running total for (day, meal_type).
+    Negative values are used when an entry is removed or moved elsewhere.
+    Does not commit: the caller commits together with the entry change.
+    """
+    stmt = _upsert_statement(db).values(
+        user_id=user_id, day=day, meal_type=meal_type, calories=calories, entry_count=count
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DailyTotal.user_id, models.DailyTotal.day, models.DailyTotal.meal_type],
+        set_={
+            "calories": models.DailyTotal.calories + stmt.excluded.calories,
+            "entry_count": models.DailyTotal.entry_count + stmt.excluded.entry_count,
+        },
+    )
+    db.execute(stmt)
+
+    # Drop buckets that no longer hold any entry so the table only contains real days.
+    if count < 0:
+        db.execute(
+            delete(models.DailyTotal)
+            .where(models.DailyTotal.user_id == user_id)
+            .where(models.DailyTotal.day == day)
+            .where(models.DailyTotal.meal_type == meal_type)
+            .where(models.DailyTotal.entry_count <= 0)
+        )
+
+
+def add_entry(db: Session, entry: models.CalorieEntry) -> None:
+    apply_delta(db, entry.user_id, entry.consumed_at.date(), entry.meal_type, entry.calories, 1)
+
+
+def remove_entry(db: Session, entry: models.CalorieEntry) -> None:
+    apply_delta(db, entry.user_id, entry.consumed_at.date(), entry.meal_type, -entry.calories, -1)
+
+
+def rebuild(db: Session) -> None:
+    """
+    Recomputes the whole daily_totals table from the entries, hot and archived, with one GROUP BY.
+    Used to backfill databases created before the table existed.
+    """
+    tables = [models.CalorieEntry.__table__] + archive.partition_tables(db)
+    entries = union_all(*(
+        select(table.c.user_id, table.c.consumed_at, table.c.meal_type, table.c.calories, table.c.id)
+        for table in tables
+    )).subquery()
+    day = func.date(entries.c.consumed_at)
+    source = (
+        select(
+            entries.c.user_id,
+            day,
+            entries.c.meal_type,
+            func.sum(entries.c.calories),
+            func.count(entries.c.id),
+        )
+        .where(entries.c.consumed_at.is_not(None))
+        .group_by(entries.c.user_id, day, entries.c.meal_type)
+    )
+    db.execute(delete(models.DailyTotal))
+    db.execute(
+        insert(models.DailyTotal).from_select(
+            ["user_id", "day", "meal_type", "calories", "entry_count"], source
+        )
+    )
+    db.commit()
+
+
+def backfill_if_empty(db: Session) -> None:
+    # Cheap check: only rebuild when there are entries but no totals yet.
+    has_totals = db.execute(select(models.DailyTotal.day).limit(1)).first() is not None
+    has_entries = db.execute(select(models.CalorieEntry.id).limit(1)).first() is not None
+    if has_entries and not has_totals:
+        rebuild(db)
+
+
+def _date_range(stmt, user_id: int, date_from: Optional[date], date_to: Optional[date]):
+    stmt = stmt.where(models.DailyTotal.user_id == user_id)
+    if date_from is not None:
+        stmt = stmt.where(models.DailyTotal.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.DailyTotal.day <= date_to)
+    return stmt
+
+
+def _week_start(db: Session):
+    # Monday of the week containing `day`, computed in SQL.
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.date_trunc("week", models.DailyTotal.day))
+    return func.date(models.DailyTotal.day, "weekday 0", "-6 days")
+
+
+def daily(db: Session, user_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    stmt = select(
+        models.DailyTotal.day,
+        func.sum(models.DailyTotal.calories),
+        func.sum(models.DailyTotal.entry_count),
+    ).group_by(models.DailyTotal.day).order_by(models.DailyTotal.day)
+    rows = db.execute(_date_range(stmt, user_id, date_from, date_to)).all()
+    return [{"date": d, "calories": c, "entry_count": n} for d, c, n in rows]
+
+
+def weekly(db: Session, user_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    week = _week_start(db).label("week_start")
+    stmt = select(
+        week,
+        func.sum(models.DailyTotal.calories),
+        func.sum(models.DailyTotal.entry_count),
+    ).group_by(week).order_by(week)
+    rows = db.execute(_date_range(stmt, user_id, date_from, date_to)).all()
+    return [{"week_start": w, "calories": c, "entry_count": n} for w, c, n in rows]
+
+
+def by_meal(db: Session, user_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    stmt = select(
+        models.DailyTotal.meal_type,
+        func.sum(models.DailyTotal.calories),
+        func.sum(models.DailyTotal.entry_count),
+    ).group_by(models.DailyTotal.meal_type).order_by(models.DailyTotal.meal_type)
+    rows = db.execute(_date_range(stmt, user_id, date_from, date_to)).all()
+    return [{"meal_type": m, "calories": c, "entry_count": n} for m, c, n in rows]
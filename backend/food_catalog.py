@@ -0,0 +1,313 @@
+# backend/food_catalog.py
+"""
+Compact, read-only food catalog stored in a single file.
+
+The file holds array columns (calories, unit ids, string offsets) plus an interned
+unit string table, an on-disk hash table for exact lookups, and the sorted word and
+trigram tables used by food_search.FoodIndex. It is opened with mmap, so nothing is
+parsed at load time and all uvicorn workers share the same pages of the OS page cache:
+startup time and per-worker memory don't grow with the catalog size.
+
+Build a catalog from CSV (columns: name, calories, unit):
+    python food_catalog.py build foods.csv foods.fcat
+"""
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from food_search import normalize, trigrams
+
+MAGIC = b"FCAT"
+VERSION = 1
+
+# Sections of the file, in the order they are written
+SECTIONS = (
+    "name_offsets",     # u32[n + 1], byte offsets into 'names'
+    "names",            # UTF-8 names, sorted, so food id == rank in sorted order
+    "calories",         # f64[n]
+    "unit_ids",         # u32[n], index into the unit string table
+    "unit_offsets",     # u32[units + 1]
+    "units",            # UTF-8 unit strings, each stored once
+    "hash_slots",       # u32[power of two], food id + 1 (0 = empty), open addressing on crc32(name)
+    "word_refs",        # u32[words], byte offset in 'names' where a later word of a name starts
+    "word_foods",       # u32[words], food id of each word ref; both sorted by the text from that word on
+    "trigram_offsets",  # u32[trigrams + 1], byte offsets into 'trigram_keys'
+    "trigram_keys",     # UTF-8 trigrams, sorted
+    "posting_offsets",  # u32[trigrams + 1], offsets into 'postings'
+    "postings",         # u32[], food ids containing each trigram
+    "trigram_counts",   # u16[n], number of distinct trigrams of each name
+)
+
+# magic, version, byte order flag, then (offset, length) for every section
+HEADER = struct.Struct("<4sII" + "QQ" * len(SECTIONS))
+BYTE_ORDER = {"little": 1, "big": 2}[sys.byteorder]
+
+
+class CatalogError(Exception):
+    pass
+
+
+def _hash(name_bytes: bytes) -> int:
+    # Must be stable across processes, so Python's (randomized) hash() can't be used
+    return zlib.crc32(name_bytes)
+
+
+def _string_table(strings) -> Tuple[array, bytes]:
+    offsets = array("I", [0])
+    blob = bytearray()
+    for text in strings:
+        blob += text.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def build(foods: Iterable[Tuple[str, Dict[str, Any]]]) -> bytes:
+    """
+    Serializes (name, {"calories": ..., "unit": ...}) pairs into the catalog format.
+    Names are normalized; when a name appears twice, the first one wins.
+    """
+    unique: Dict[str, Tuple[float, str]] = {}
+    for name, info in foods:
+        key = normalize(name)
+        if key and key not in unique:
+            unique[key] = (float(info["calories"]), str(info.get("unit", "")))
+    names = sorted(unique)
+
+    name_offsets, names_blob = _string_table(names)
+    calories = array("d", (unique[name][0] for name in names))
+
+    unit_ids = array("I")
+    unit_index: Dict[str, int] = {}
+    for name in names:
+        unit_ids.append(unit_index.setdefault(unique[name][1], len(unit_index)))
+    unit_offsets, units_blob = _string_table(unit_index)
+
+    slot_count = 1
+    while slot_count < 2 * len(names):
+        slot_count *= 2
+    hash_slots = array("I", bytes(4 * slot_count))
+    for food_id in range(len(names)):
+        slot = _hash(names_blob[name_offsets[food_id]:name_offsets[food_id + 1]]) & (slot_count - 1)
+        while hash_slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        hash_slots[slot] = food_id + 1
+
+    words = []
+    for food_id, name in enumerate(names):
+        start = name_offsets[food_id]
+        # Byte position of each word after the first one (the first is covered by the name itself)
+        position = 0
+        for index, word in enumerate(name.split(" ")):
+            if index:
+                words.append((name[position:], start + len(name[:position].encode("utf-8")), food_id))
+            position += len(word) + 1
+    words.sort()
+    word_refs = array("I", (ref for _, ref, _ in words))
+    word_foods = array("I", (food_id for _, _, food_id in words))
+
+    postings_by_gram: Dict[str, array] = {}
+    trigram_counts = array("H")
+    for food_id, name in enumerate(names):
+        grams = trigrams(name)
+        trigram_counts.append(min(len(grams), 0xFFFF))
+        for gram in grams:
+            postings_by_gram.setdefault(gram, array("I")).append(food_id)
+    keys = sorted(postings_by_gram)
+    trigram_offsets, trigram_keys = _string_table(keys)
+    posting_offsets = array("I", [0])
+    postings = array("I")
+    for gram in keys:
+        postings.extend(postings_by_gram[gram])
+        posting_offsets.append(len(postings))
+
+    sections = {
+        "name_offsets": name_offsets, "names": names_blob, "calories": calories,
+        "unit_ids": unit_ids, "unit_offsets": unit_offsets, "units": units_blob,
+        "hash_slots": hash_slots, "word_refs": word_refs, "word_foods": word_foods,
+        "trigram_offsets": trigram_offsets, "trigram_keys": trigram_keys,
+        "posting_offsets": posting_offsets, "postings": postings, "trigram_counts": trigram_counts,
+    }
+    body = bytearray()
+    table = []
+    for section in SECTIONS:
+        data = bytes(sections[section])
+        body += bytes(-(HEADER.size + len(body)) % 8) # Keep every section 8-byte aligned
+        table += [HEADER.size + len(body), len(data)]
+        body += data
+    return HEADER.pack(MAGIC, VERSION, BYTE_ORDER, *table) + bytes(body)
+
+
+class FoodCatalog:
+    """
+    Read-only view over a catalog buffer (an mmap of a catalog file, or bytes).
+    Food ids are positions in the sorted name list.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise CatalogError("File is too small to be a food catalog")
+        magic, version, byte_order, *table = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise CatalogError("Not a food catalog file, or built by an incompatible version")
+        if byte_order != BYTE_ORDER:
+            raise CatalogError("Food catalog was built on a machine with a different byte order")
+
+        def section(index: int, fmt: Optional[str] = None):
+            offset, length = table[2 * index], table[2 * index + 1]
+            data = view[offset:offset + length]
+            return data.cast(fmt) if fmt else data
+
+        (self._name_offsets, self._names, self._calories, self._unit_ids, self._unit_offsets,
+         self._units, self._hash_slots, self._word_refs, self._word_foods, self._trigram_offsets,
+         self._trigram_keys, self._posting_offsets, self._postings, self._trigram_counts) = (
+            section(i, fmt) for i, fmt in enumerate(
+                ("I", None, "d", "I", "I", None, "I", "I", "I", "I", None, "I", "I", "H")
+            )
+        )
+        self._unit_cache: Dict[int, str] = {}
+
+    @classmethod
+    def open(cls, path: str) -> "FoodCatalog":
+        with open(path, "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_items(cls, foods: Iterable[Tuple[str, Dict[str, Any]]]) -> "FoodCatalog":
+        return cls(build(foods))
+
+    def __len__(self) -> int:
+        return len(self._calories)
+
+    def _name_bytes(self, food_id: int):
+        return self._names[self._name_offsets[food_id]:self._name_offsets[food_id + 1]]
+
+    def name(self, food_id: int) -> str:
+        return str(self._name_bytes(food_id), "utf-8")
+
+    def unit(self, food_id: int) -> str:
+        unit_id = self._unit_ids[food_id]
+        unit = self._unit_cache.get(unit_id)
+        if unit is None:
+            raw = self._units[self._unit_offsets[unit_id]:self._unit_offsets[unit_id + 1]]
+            unit = self._unit_cache[unit_id] = str(raw, "utf-8")
+        return unit
+
+    def info(self, food_id: int) -> Dict[str, Any]:
+        return {"calories": self._calories[food_id], "unit": self.unit(food_id)}
+
+    def items(self):
+        for food_id in range(len(self)):
+            yield self.name(food_id), self.info(food_id)
+
+    def find(self, name: str) -> Optional[int]:
+        """
+        Returns the id of the food with this (already normalized) name, in O(1).
+        """
+        if not len(self):
+            return None
+        key = name.encode("utf-8")
+        mask = len(self._hash_slots) - 1
+        slot = _hash(key) & mask
+        while True:
+            entry = self._hash_slots[slot]
+            if not entry:
+                return None
+            if self._name_bytes(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def first_with_prefix(self, prefix: str) -> int:
+        return bisect_left(range(len(self)), prefix, key=self.name)
+
+    # Later words of names, sorted, for "breast" -> "chicken breast"
+    def word_count(self) -> int:
+        return len(self._word_refs)
+
+    def word_text(self, position: int) -> str:
+        food_id = self._word_foods[position]
+        return str(self._names[self._word_refs[position]:self._name_offsets[food_id + 1]], "utf-8")
+
+    def word_food(self, position: int) -> int:
+        return self._word_foods[position]
+
+    def first_word_with_prefix(self, prefix: str) -> int:
+        return bisect_left(range(self.word_count()), prefix, key=self.word_text)
+
+    # Trigram index, for typo-tolerant search
+    def _trigram_key(self, position: int) -> str:
+        return str(self._trigram_keys[self._trigram_offsets[position]:self._trigram_offsets[position + 1]], "utf-8")
+
+    def postings(self, gram: str):
+        """
+        Returns the ids of the foods whose name contains this trigram (a memoryview of u32).
+        """
+        count = len(self._posting_offsets) - 1
+        position = bisect_left(range(count), gram, key=self._trigram_key)
+        if position == count or self._trigram_key(position) != gram:
+            return self._postings[0:0]
+        return self._postings[self._posting_offsets[position]:self._posting_offsets[position + 1]]
+
+    def trigram_count(self, food_id: int) -> int:
+        return self._trigram_counts[food_id]
+
+
+def write(path: str, data: bytes) -> None:
+    """
+    Replaces the catalog file at `path` atomically.
+    Running workers may have the old file memory-mapped: truncating it in place would make
+    their reads past the new end fail with SIGBUS. Renaming a new file over it leaves their
+    mapping on the old file, and the new one is used by workers that open it afterwards.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".fcat-", dir=directory) # Same filesystem, so the rename is atomic
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644) # mkstemp creates the file readable by its owner only
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_csv(path: str):
+    """
+    Reads (name, info) pairs from a CSV file with a header row.
+    The name column can be called 'name' or 'food_name'.
+    """
+    # utf-8-sig drops the byte order mark Excel writes, which would otherwise be part of the first column name
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            name = row.get("name") or row.get("food_name")
+            if not name or not row.get("calories"):
+                continue
+            yield name, {"calories": float(row["calories"]), "unit": row.get("unit") or ""}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage food catalog files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser("build", help="Build a catalog file from a CSV (name, calories, unit).")
+    build_command.add_argument("csv_path")
+    build_command.add_argument("catalog_path")
+    args = parser.parse_args()
+
+    data = build(read_csv(args.csv_path))
+    count = len(FoodCatalog(data))
+    if count == 0:
+        # Most likely a wrong header: don't replace a catalog the app may be serving with an empty one
+        sys.exit(f"No foods read from {args.csv_path}: it needs a header with 'name' (or 'food_name') and 'calories'")
+    write(args.catalog_path, data)
+    print(f"Wrote {count} foods to {args.catalog_path}")
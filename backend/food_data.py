@@ -1,4 +1,12 @@
 # backend/food_data.py
+import os
+
+from food_catalog import FoodCatalog
+from food_search import FoodIndex
+
+# Path of a catalog file built with `python food_catalog.py build foods.csv foods.fcat`.
+# When it is not set, the small built-in FOOD_CALORIES list below is used.
+FOOD_CATALOG_PATH = os.getenv("FOOD_CATALOG_PATH")
 
 
 FOOD_CALORIES = {
@@ -17,6 +25,19 @@ FOOD_CALORIES = {
     "carrot": {"calories": 52.0, "unit": "1 cup chopped"}
 }
 
+# The catalog is opened on first lookup, not at import time
+_food_index: FoodIndex | None = None
+
+def get_food_index() -> FoodIndex:
+    global _food_index
+    if _food_index is None:
+        if FOOD_CATALOG_PATH:
+            catalog = FoodCatalog.open(FOOD_CATALOG_PATH) # Memory-mapped, shared between workers
+        else:
+            catalog = FoodCatalog.from_items(FOOD_CALORIES.items())
+        _food_index = FoodIndex(catalog)
+    return _food_index
+
 def get_calories_by_food_name(food_name: str) -> float | None:
-    food_info = FOOD_CALORIES.get(food_name.lower())
-    return food_info["calories"] if food_info else None
\ No newline at end of file
+    food_info = get_food_index().get(food_name)
+    return food_info["calories"] if food_info else None
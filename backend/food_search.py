@@ -0,0 +1,142 @@
+# backend/food_search.py
+import heapq
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Match kinds, best first. Results are ranked by kind, then by score.
+EXACT, PREFIX, WORD_PREFIX, FUZZY = "exact", "prefix", "word_prefix", "fuzzy"
+
+# Fuzzy matches need at least this trigram similarity (0..1) to be returned.
+MIN_SIMILARITY = 0.3
+
+# Fuzzy matching only tops up prefix results for queries up to this length. Longer queries
+# only get fuzzy results when nothing matched by name or word prefix.
+FUZZY_FILL_MAX_LENGTH = 12
+
+# Food ids read from posting lists per fuzzy search. Lists are read rarest first until the
+# budget is used, so very common trigrams (in tens of thousands of names) are never scanned.
+FUZZY_POSTING_BUDGET = 8000
+
+# Candidates with the most shared trigrams that get their exact similarity computed
+FUZZY_CANDIDATES = 32
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def trigrams(text: str) -> set:
+    # Padded like PostgreSQL's pg_trgm, so short words and word starts still produce trigrams
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodIndex:
+    """
+    Search over a food_catalog.FoodCatalog. The index structures live in the catalog
+    itself (usually a memory-mapped file), so creating a FoodIndex costs nothing.
+
+    - `get()` is an O(1) exact lookup through the catalog's hash table.
+    - Prefix search is a binary search in the sorted name list, plus a sorted list of
+      later words so "breast" also finds "chicken breast".
+    - When prefix matching finds nothing (or, for short queries, fewer than `limit`
+      foods), the trigram index finds names with typos ("brocoli" -> "broccoli").
+      It reads a bounded number of posting entries, so its cost doesn't grow with
+      the catalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        food_id = self.catalog.find(normalize(name))
+        return self.catalog.info(food_id) if food_id is not None else None
+
+    def items(self):
+        return self.catalog.items()
+
+    def _prefix_range(self, start: int, count: int, text, food, prefix: str, limit: int):
+        for position in range(start, count):
+            if limit <= 0 or not text(position).startswith(prefix):
+                break
+            yield food(position)
+            limit -= 1
+
+    def _fuzzy(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        query_grams = trigrams(query)
+        postings = self.catalog.postings
+        # Candidates come from the rarest posting lists only: they are short and the most
+        # telling, while a name similar to the query shares most of its trigrams anyway.
+        # The candidates sharing the most of those trigrams are then scored exactly.
+        lists = sorted((postings(gram) for gram in query_grams), key=len)
+        shared = Counter()
+        budget = FUZZY_POSTING_BUDGET
+        for food_ids in lists:
+            if len(food_ids) > budget:
+                break
+            shared.update(food_ids)
+            budget -= len(food_ids)
+
+        # Most shared trigrams first; among equals, names about as long as the query
+        trigram_count = self.catalog.trigram_count
+        query_count = len(query_grams)
+
+        def rank(item):
+            food_id, count = item
+            return count, -abs(trigram_count(food_id) - query_count)
+
+        # Only ids sharing as many trigrams as the FUZZY_CANDIDATES-th best one can make the cut
+        counts = heapq.nlargest(FUZZY_CANDIDATES, shared.values())
+        threshold = counts[-1] if counts else 0
+        best = [item for item in shared.items() if item[1] >= threshold]
+
+        scored = []
+        for food_id, _ in heapq.nlargest(FUZZY_CANDIDATES, best, key=rank):
+            count = len(query_grams & trigrams(self.catalog.name(food_id)))
+            similarity = count / (len(query_grams) + self.catalog.trigram_count(food_id) - count)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, food_id))
+        # Food ids follow name order, so ties are broken alphabetically
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` foods matching `query`, best matches first.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        found: Dict[int, Tuple[str, float]] = {}
+
+        def add(food_id: int, kind: str, score: float = 1.0):
+            if food_id not in found and len(found) < limit:
+                found[food_id] = (kind, score)
+
+        catalog = self.catalog
+        exact = catalog.find(query)
+        if exact is not None:
+            add(exact, EXACT)
+        for food_id in self._prefix_range(
+            catalog.first_with_prefix(query), len(catalog), catalog.name, int, query, limit
+        ):
+            add(food_id, PREFIX)
+        if len(found) < limit:
+            for food_id in self._prefix_range(
+                catalog.first_word_with_prefix(query), catalog.word_count(),
+                catalog.word_text, catalog.word_food, query, limit
+            ):
+                add(food_id, WORD_PREFIX)
+        if not found or (len(found) < limit and len(query) <= FUZZY_FILL_MAX_LENGTH):
+            for similarity, food_id in self._fuzzy(query, limit):
+                add(food_id, FUZZY, similarity)
+
+        # Insertion order already follows the ranking
+        return [
+            {"name": catalog.name(food_id), "match": kind, "score": round(score, 3), **catalog.info(food_id)}
+            for food_id, (kind, score) in found.items()
+        ]
@@ -1,41 +1,117 @@
-# Pydantic model for updating a Calorie Entry
-class CalorieEntryUpdate(BaseModel):
-    food_name: Optional[str] = None
-    calories: Optional[float] = None
-    meal_type: Optional[str] = None
-
-# Endpoint to update a calorie entry
-@app.put("/entries/{entry_id}", response_model=CalorieEntryResponse)
-def update_calorie_entry(entry_id: int, entry: CalorieEntryUpdate, db: Session = Depends(get_db)):
-    db_entry = db.query(models.CalorieEntry).filter(models.CalorieEntry.id == entry_id).first()
-    if db_entry is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found")
-    if entry.food_name is not None:
-        db_entry.food_name = entry.food_name
-    if entry.calories is not None:
-        db_entry.calories = entry.calories
-    if entry.meal_type is not None:
-        db_entry.meal_type = entry.meal_type
-    db.commit()
-    db.refresh(db_entry)
-    db_entry.consumed_at = db_entry.consumed_at.isoformat()
-    return db_entry
 # backend/main.py
-from fastapi import FastAPI, Depends, HTTPException, status # Import status for HTTP status codes
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status # Import status for HTTP status codes
+from fastapi.concurrency import run_in_threadpool
+from urllib.parse import urlencode
+from contextlib import asynccontextmanager
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict
-from datetime import datetime # Import datetime for explicit conversion
+from datetime import datetime, date # Import datetime for explicit conversion
 
-import models, database
+import database
 import food_data
+import daily_totals
+import pagination
+import bulk_import
+import crud
+import cache
+import serialization
+import profiling
+import migrations
+from users import get_user_id, parse_user_id
+from schemas import (
+    CalorieEntryCreate, CalorieEntryResponse, CalorieEntryUpdate, FoodSearchResult,
+    BulkImportResponse, DailyStatsResponse, WeeklyStatsResponse, MealStatsResponse,
+)
+
+# Create database tables when the application starts, and upgrade tables created by
+# earlier versions (see migrations.py).
+migrations.upgrade(database.engine)
+
+# Fill daily_totals for databases that already had entries before the table was added
+with database.SessionLocal() as _db:
+    daily_totals.backfill_if_empty(_db)
+
+# Close pooled connections on shutdown. In async mode this is required:
+# aiosqlite keeps a thread per open connection, which would keep the process alive.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+    database.engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Response caching for the read endpoints (see cache.py)
+# Maps each cached path to the data it depends on: entry data is invalidated by writes,
+# the food catalog is read-only while the app runs.
+CACHED_PATHS = {
+    "/entries/": "entries",
+    "/stats/daily": "entries",
+    "/stats/weekly": "entries",
+    "/stats/by-meal": "entries",
+    "/food-suggestions/": "catalog",
+    "/foods/search": "catalog",
+}
+# Response headers stored together with the cached body
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
 
-# Create database tables when the application starts
-# This will create the 'calorie_entries' table if it doesn't already exist.
-models.Base.metadata.create_all(bind=database.engine)
+async def _cache_call(function, *args):
+    # The in-process cache is fast enough to call from the event loop directly
+    if cache.is_remote:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
 
-app = FastAPI()
+# Registered before CORSMiddleware, so CORS headers are still added to cached responses
+@app.middleware("http")
+async def cache_responses(request: Request, call_next):
+    kind = CACHED_PATHS.get(request.url.path)
+    # Streamed exports are not cached: that would mean buffering the whole body.
+    # Any `stream` parameter skips the cache, so this can't disagree with how FastAPI
+    # parses the flag (it also accepts "t", "y", ...).
+    streamed = "stream" in request.query_params
+    if request.method != "GET" or kind is None or cache.backend is None or streamed:
+        return await call_next(request)
+
+    if kind == "entries":
+        try:
+            user_id = parse_user_id(request.headers.get("x-user-id"))
+            date_from = _parse_date(request.query_params.get("from"))
+            date_to = _parse_date(request.query_params.get("to"))
+        except ValueError:
+            return await call_next(request) # Let the endpoint report the invalid header or date
+        versions = await _cache_call(cache.entry_versions, user_id, date_from, date_to)
+        scope = f"user:{user_id}"
+    else:
+        versions = "catalog"
+        scope = "catalog" # Same for every user
+    key = f"resp:{scope}:{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}:{versions}"
+
+    cached = await _cache_call(cache.get_response, key)
+    if cached is None:
+        response = await call_next(request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        headers["etag"] = cache.etag(body) # Computed once, stored with the body
+        await _cache_call(cache.set_response, key, response.status_code, headers, body)
+        cached = (response.status_code, headers, body)
+
+    status_code, headers, body = cached
+    # no-cache: clients may store the response, but must revalidate it with If-None-Match
+    validators = {"etag": headers["etag"], "cache-control": "no-cache"}
+    if kind == "entries":
+        validators["vary"] = "X-User-Id" # Entry responses depend on the user
+    if cache.etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+    return Response(content=body, status_code=status_code, headers={**headers, **validators})
 
 # CORS (Cross-Origin Resource Sharing) Configuration
 # This allows your React frontend (running on a different port) to communicate with this backend.
@@ -52,28 +128,13 @@ app.add_middleware(
     allow_credentials=True,         # Allow cookies to be included in cross-origin HTTP requests
     allow_methods=["*"],            # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],            # Allow all headers
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "X-SQL-Count"], # Let the frontend read the pagination cursor of GET /entries/
 )
 
-# Pydantic model for the request body when creating a new Calorie Entry
-
-# Add meal_type to creation model
-class CalorieEntryCreate(BaseModel):
-    food_name: str
-    calories: Optional[float] = None # Calories field is now optional
-    meal_type: str # Breakfast, Lunch, Dinner, Snacks
-
-# Pydantic model for the response body when reading or creating a Calorie Entry
-
-# Add meal_type to response model
-class CalorieEntryResponse(BaseModel):
-    id: int
-    food_name: str
-    calories: float
-    meal_type: str
-    consumed_at: str
-
-    class Config:
-        orm_mode = True # Enables Pydantic to read data directly from SQLAlchemy models
+# Opt-in request timing and SQL statement counts (see profiling.py).
+# Added last, so it is the outermost middleware and measures everything else.
+if profiling.PROFILE_REQUESTS:
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # Dependency function to get a database session
 # This ensures a session is created for each request and closed afterwards.
@@ -85,6 +146,8 @@ def get_db():
         db.close()
 
 ## API Endpoints
+# The entry and stats endpoints only see the entries of the user given in the
+# X-User-Id header (see users.py).
 
 # Endpoint to get food suggestions for autocomplete in the frontend
 from typing import Any
@@ -92,8 +155,19 @@ from typing import Any
 def get_food_suggestions():
     """
     Returns a dictionary of food names and their calorie/unit info for suggestions in the frontend.
+    For large catalogs, use /foods/search instead.
+    """
+    return dict(food_data.get_food_index().items())
+
+# Endpoint to search foods by name, for autocomplete on large catalogs
+@app.get("/foods/search", response_model=list[FoodSearchResult])
+def search_foods(q: str, limit: int = Query(10, ge=1, le=100)):
+    """
+    Returns up to `limit` foods matching `q`, best first:
+    exact name, then name prefix, then prefix of a later word in the name,
+    then similar names (typo tolerant, by trigram similarity).
     """
-    return food_data.FOOD_CALORIES
+    return food_data.get_food_index().search(q, limit)
 
 # Root endpoint for a simple health check or welcome message
 @app.get("/")
@@ -105,70 +179,193 @@ def read_root():
 
 # Endpoint to create a new calorie entry
 @app.post("/entries/", response_model=CalorieEntryResponse)
-def create_calorie_entry(entry: CalorieEntryCreate, db: Session = Depends(get_db)):
+def create_calorie_entry(
+    entry: CalorieEntryCreate,
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
     """
     Creates a new calorie entry in the database.
     If calories are not provided, attempts to auto-calculate from `food_data`.
     """
-    final_calories: float
+    # If calories were not manually provided, try to find them in the food catalog
+    final_calories = crud.resolve_calories(entry)
+    if final_calories is None:
+        # If calories could not be found and user didn't provide them, raise an error
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, # Use status.HTTP_400_BAD_REQUEST
+            detail="Calories not provided and food name not found in database. Please provide calories manually."
+        )
 
-    # If calories were not manually provided by the user
-    if entry.calories is None:
-        # Try to find calories from the predefined food_data list
-        auto_calculated_calories = food_data.get_calories_by_food_name(entry.food_name)
+    # consumed_at is serialized by the response model, the ORM object is returned unchanged
+    return crud.create_entry(db, user_id, entry, final_calories)
 
-        if auto_calculated_calories is None:
-            # If calories could not be found and user didn't provide them, raise an error
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, # Use status.HTTP_400_BAD_REQUEST
-                detail="Calories not provided and food name not found in database. Please provide calories manually."
-            )
-        else:
-            # If auto-calculated calories were found, use them
-            final_calories = auto_calculated_calories
-    else:
-        # If calories were manually provided, use the user's input
-        final_calories = entry.calories
+# Endpoint to import many calorie entries at once
+@app.post("/entries/bulk", response_model=BulkImportResponse)
+async def bulk_create_calorie_entries(
+    request: Request,
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=50000),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Imports entries from the request body, which can be:
+    - a JSON array of entries (`Content-Type: application/json`)
+    - one JSON entry per line (`Content-Type: application/x-ndjson`)
+    - CSV with a header row (`Content-Type: text/csv`)
 
-    # Create a new CalorieEntry model instance with meal_type
-    db_entry = models.CalorieEntry(food_name=entry.food_name, calories=final_calories, meal_type=entry.meal_type)
-    db.add(db_entry)  # Add the new entry object to the session
-    db.commit()       # Commit the transaction to save to the database
-    db.refresh(db_entry) # Refresh the object to get any database-generated values (like 'id', 'consumed_at')
+    Each entry has `food_name`, `meal_type` and optionally `calories` and `consumed_at`.
+    NDJSON and CSV bodies are read as a stream and inserted in chunks of `chunk_size` rows,
+    one transaction per chunk. Invalid rows are skipped and reported, they don't stop the import.
+    """
+    parse = bulk_import.parser_for(request.headers.get("content-type", ""))
+    if parse is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use application/json, application/x-ndjson or text/csv."
+        )
 
-    # Explicitly convert consumed_at to string before returning
-    # This ensures Pydantic receives a string, bypassing potential serialization issues.
-    db_entry.consumed_at = db_entry.consumed_at.isoformat()
+    result = bulk_import.ImportResult()
+    chunk = []
+    try:
+        async for number, raw in parse(request.stream()):
+            if isinstance(raw, Exception):
+                result.add_error(number, str(raw))
+                continue
+            try:
+                chunk.append(bulk_import.to_db_row(raw, user_id))
+            except ValueError as exc:
+                result.add_error(number, str(exc))
+                continue
+            if len(chunk) >= chunk_size:
+                # Database work is blocking, so run it outside the event loop
+                await run_in_threadpool(bulk_import.insert_chunk, db, chunk)
+                result.inserted += len(chunk)
+                chunk = []
+        await run_in_threadpool(bulk_import.insert_chunk, db, chunk)
+        result.inserted += len(chunk)
+    except ValueError as exc:
+        # The body itself is unreadable (bad JSON array, bad encoding). Chunks already committed stay.
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
-    return db_entry
+    return result.as_dict()
 
 # NEW ENDPOINT: Delete a calorie entry
 @app.delete("/entries/{entry_id}", status_code=status.HTTP_204_NO_CONTENT) # 204 No Content for successful deletion
-def delete_calorie_entry(entry_id: int, db: Session = Depends(get_db)):
+def delete_calorie_entry(entry_id: int, user_id: int = Depends(get_user_id), db: Session = Depends(get_db)):
     """
     Deletes a calorie entry by its ID.
     Returns 204 No Content on successful deletion, 404 if not found.
     """
-    db_entry = db.query(models.CalorieEntry).filter(models.CalorieEntry.id == entry_id).first()
-    if db_entry is None:
+    if not crud.delete_entry(db, user_id, entry_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found") # Use status.HTTP_404_NOT_FOUND
-    
-    db.delete(db_entry)
-    db.commit()
     return {"message": "Entry deleted successfully"} # This return is technically ignored for 204, but good practice.
 
-# Endpoint to retrieve all calorie entries
+# Endpoint to update a calorie entry
+@app.put("/entries/{entry_id}", response_model=CalorieEntryResponse)
+def update_calorie_entry(
+    entry_id: int,
+    entry: CalorieEntryUpdate,
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
+    db_entry = crud.update_entry(db, user_id, entry_id, entry)
+    if db_entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found")
+    return db_entry
+
+# Endpoint to retrieve calorie entries
 @app.get("/entries/", response_model=list[CalorieEntryResponse])
-def read_calorie_entries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_calorie_entries(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    meal_type: Optional[str] = None,
+    stream: bool = False,
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieves the user's calorie entries, newest first, including archived ones (see archive.py).
+    Filters: `from`/`to` (dates, inclusive) and `meal_type`.
+    Pagination: pass the `X-Next-Cursor` response header of one page as `cursor` to get the next one,
+    or `before` (a datetime) to start at an earlier point in time.
+    The legacy `skip` offset is still accepted when no cursor is given, but gets slower on deep pages.
+    With `stream=true`, every matching entry is returned as one streamed JSON array
+    (for exports; `limit` and `skip` don't apply).
+    """
+    try:
+        if stream:
+            if cursor is not None:
+                pagination.cursor_datetime(db, cursor) # Fail with 400 before the response starts
+            return StreamingResponse(
+                serialization.stream_entries_json(
+                    crud.iter_entry_batches(user_id, cursor, before, date_from, date_to, meal_type)
+                ),
+                media_type="application/json",
+            )
+        rows, next_cursor = crud.list_entries(
+            db, user_id, limit, cursor, before, date_from, date_to, meal_type, skip
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    # Rows are serialized straight to JSON, without building a Pydantic model per row
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    return serialization.entries_response(rows, headers)
+
+## Stats Endpoints
+# These read from the pre-aggregated 'daily_totals' table, so their cost depends on
+# the number of days in the range, not on the number of entries.
+
+@app.get("/stats/daily", response_model=list[DailyStatsResponse])
+def read_daily_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns total calories and entry count per day, optionally limited to a `from`/`to` date range.
+    """
+    return daily_totals.daily(db, user_id, date_from, date_to)
+
+@app.get("/stats/weekly", response_model=list[WeeklyStatsResponse])
+def read_weekly_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns total calories and entry count per week (weeks start on Monday).
+    """
+    return daily_totals.weekly(db, user_id, date_from, date_to)
+
+@app.get("/stats/by-meal", response_model=list[MealStatsResponse])
+def read_meal_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db),
+):
     """
-    Retrieves a list of all calorie entries from the database.
-    Supports basic pagination with `skip` and `limit` parameters.
+    Returns total calories and entry count per meal type over the date range.
     """
-    entries = db.query(models.CalorieEntry).offset(skip).limit(limit).all()
-    
-    # Explicitly convert consumed_at to string for each entry
-    # This is needed for the list of entries as well to match the Pydantic response model.
-    for entry in entries:
-        entry.consumed_at = entry.consumed_at.isoformat()
+    return daily_totals.by_meal(db, user_id, date_from, date_to)
 
-    return entries
\ No newline at end of file
+# In async mode, the /entries/ endpoints are served by the async handlers in async_entries.py.
+# The sync versions above are removed from the routes so each path has exactly one handler.
+if database.ASYNC_MODE:
+    import async_entries
+    async_routes = {
+        (route.path, method) for route in async_entries.router.routes for method in route.methods
+    }
+    app.router.routes = [
+        route for route in app.router.routes
+        if not (isinstance(route, APIRoute) and any((route.path, m) in async_routes for m in route.methods))
+    ]
+    app.include_router(async_entries.router)
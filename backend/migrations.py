@@ -0,0 +1,66 @@
+# backend/migrations.py
+"""
+Creates the schema, and upgrades databases created by earlier versions of the app.
+
+create_all() only creates missing tables, so changes to existing tables are made here.
+Every step checks the current schema first, so running upgrade() again does nothing.
+"""
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+
+import models
+from users import DEFAULT_USER_ID
+
+# Indexes that were replaced by a newer one and are dropped from existing databases
+OBSOLETE_INDEXES = (
+    "ix_calorie_entries_consumed_at_id", # Replaced by ix_calorie_entries_user_id_consumed_at_id
+)
+
+
+def _columns(engine: Engine, table: str) -> set:
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def _add_entry_owner(engine: Engine) -> None:
+    # Existing entries are given to the default user
+    if engine.dialect.name == "sqlite":
+        # SQLite can add a column, but not AUTOINCREMENT (see models.CalorieEntry),
+        # so the table is rebuilt with the new definition and the rows copied over.
+        new_table = models.CalorieEntry.__table__.to_metadata(MetaData(), name="calorie_entries_new")
+        columns = "id, food_name, calories, meal_type, consumed_at"
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS calorie_entries_new") # Left over by an interrupted upgrade
+            conn.execute(CreateTable(new_table))
+            conn.exec_driver_sql(
+                f"INSERT INTO calorie_entries_new (user_id, {columns}) "
+                f"SELECT {DEFAULT_USER_ID}, {columns} FROM calorie_entries"
+            )
+            conn.exec_driver_sql("DROP TABLE calorie_entries") # Also drops its indexes
+            conn.exec_driver_sql("ALTER TABLE calorie_entries_new RENAME TO calorie_entries")
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"ALTER TABLE calorie_entries ADD COLUMN user_id INTEGER NOT NULL DEFAULT {DEFAULT_USER_ID}"
+            )
+            conn.exec_driver_sql("ALTER TABLE calorie_entries ALTER COLUMN user_id DROP DEFAULT")
+
+
+def upgrade(engine: Engine) -> None:
+    models.Base.metadata.create_all(bind=engine)
+
+    if "user_id" not in _columns(engine, "calorie_entries"):
+        _add_entry_owner(engine)
+
+    if "user_id" not in _columns(engine, "daily_totals"):
+        # The primary key changed to (user_id, day, meal_type). The table only holds
+        # derived data, so it is recreated empty and refilled by daily_totals.backfill_if_empty.
+        models.DailyTotal.__table__.drop(bind=engine)
+        models.DailyTotal.__table__.create(bind=engine)
+
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    # Add indexes introduced after the table was created
+    for index in models.CalorieEntry.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
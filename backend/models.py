@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Index
 from sqlalchemy.sql import func
 from database import Base # FIXED: Changed from relative to absolute import
 
@@ -10,4 +10,37 @@ class CalorieEntry(Base):
     food_name = Column(String, index=True)
     calories = Column(Float)
     meal_type = Column(String, index=True, default="Breakfast") # New: meal type (Breakfast, Lunch, Dinner, Snack)
-    consumed_at = Column(DateTime, default=func.now()) # Date and time of entry
\ No newline at end of file
+    consumed_at = Column(DateTime, default=func.now()) # Date and time of entry
+    user_id = Column(Integer, nullable=False) # Owner of the entry (see users.py)
+
+    __table_args__ = (
+        # Composite index used by every GET /entries/ query: one user's entries, in the
+        # keyset (cursor) pagination order. Ordering by (consumed_at, id) is stable even
+        # when two entries share a timestamp.
+        Index("ix_calorie_entries_user_id_consumed_at_id", "user_id", "consumed_at", "id"),
+        # Never reuse the id of a deleted entry on SQLite: ids of archived entries
+        # (see archive.py) must stay unique across the hot table and the archive.
+        {"sqlite_autoincrement": True},
+    )
+
+class DailyTotal(Base):
+    # Pre-aggregated calories per (user_id, day, meal_type).
+    # Kept up to date by the entry handlers in the same transaction as the entry itself,
+    # so the /stats/ endpoints read O(days) rows instead of scanning every entry.
+    # Archiving entries leaves their totals here, so they cover hot and archived entries alike.
+    __tablename__ = "daily_totals"
+
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    meal_type = Column(String, primary_key=True)
+    calories = Column(Float, nullable=False, default=0.0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+class ArchivePartition(Base):
+    # One row per monthly archive table of calorie entries (see archive.py)
+    __tablename__ = "entry_archive_partitions"
+
+    month = Column(Date, primary_key=True) # First day of the month
+    table_name = Column(String, nullable=False)
+    entry_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, default=func.now()) # Last time entries were moved in
@@ -0,0 +1,165 @@
+# backend/pagination.py
+import base64
+import heapq
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import Select, String, Table, and_, or_, type_coerce
+from sqlalchemy.orm import Session
+
+import models
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _entries_table(table: Optional[Table]) -> Table:
+    # Entry queries run on the hot table by default, or on an archive partition (see archive.py)
+    return models.CalorieEntry.__table__ if table is None else table
+
+
+def timestamp_column(db: Session, table: Optional[Table] = None):
+    # SQLite stores DATETIME as text, and rows written by CURRENT_TIMESTAMP have no
+    # microseconds while SQLAlchemy would bind '...ss.000000'. Comparing against the
+    # raw text (type_coerce emits no CAST, so the index is still used) keeps equal
+    # timestamps equal.
+    column = _entries_table(table).c.consumed_at
+    if _is_sqlite(db):
+        return type_coerce(column, String)
+    return column
+
+
+def utc_naive(value: datetime) -> datetime:
+    # consumed_at is stored as naive UTC, so aware datetimes (e.g. `before` with an offset) are converted
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def timestamp_value(db: Session, value: datetime):
+    value = utc_naive(value)
+    return value.isoformat(sep=" ") if _is_sqlite(db) else value
+
+
+def encode_cursor(db: Session, consumed_at, entry_id: int) -> str:
+    """
+    Builds the opaque cursor pointing just after the given row.
+    """
+    # On SQLite the key is already the raw stored text; other databases return a datetime.
+    if isinstance(consumed_at, datetime):
+        consumed_at = consumed_at.isoformat()
+    raw = json.dumps([consumed_at, entry_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(db: Session, cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        consumed_at, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(consumed_at, str) or not isinstance(entry_id, int):
+            raise ValueError
+        if not _is_sqlite(db):
+            consumed_at = datetime.fromisoformat(consumed_at)
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+    return consumed_at, entry_id
+
+
+def cursor_datetime(db: Session, cursor: str) -> datetime:
+    """
+    Returns the timestamp a cursor points at. Raises InvalidCursor for a malformed cursor.
+    """
+    consumed_at, _ = decode_cursor(db, cursor)
+    if isinstance(consumed_at, datetime):
+        return consumed_at
+    try:
+        return datetime.fromisoformat(consumed_at)
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def filter_entries(
+    db: Session,
+    stmt: Select,
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    meal_type: Optional[str] = None,
+    table: Optional[Table] = None,
+) -> Select:
+    """
+    Limits the statement to the user's entries, then applies the `from`/`to` date range
+    (inclusive) and meal type filters.
+    """
+    table = _entries_table(table)
+    ts = timestamp_column(db, table)
+    stmt = stmt.where(table.c.user_id == user_id)
+    if date_from is not None:
+        stmt = stmt.where(ts >= timestamp_value(db, datetime.combine(date_from, time.min)))
+    if date_to is not None:
+        next_day = datetime.combine(date_to + timedelta(days=1), time.min)
+        stmt = stmt.where(ts < timestamp_value(db, next_day))
+    if meal_type is not None:
+        stmt = stmt.where(table.c.meal_type == meal_type)
+    return stmt
+
+
+def keyset_order(
+    db: Session,
+    stmt: Select,
+    cursor: Optional[str] = None,
+    before: Optional[datetime] = None,
+    table: Optional[Table] = None,
+) -> Select:
+    """
+    Orders the statement newest first and starts it after `cursor` (or at `before`).
+    Adds a 'cursor_key' column, which encode_cursor needs for the next cursor.
+    Raises InvalidCursor for a malformed cursor.
+
+    Pages are found with an index range scan on (user_id, consumed_at, id), so their
+    cost does not grow with how deep into the history the client is.
+    """
+    table = _entries_table(table)
+    ts = timestamp_column(db, table)
+    if cursor is not None:
+        last_ts, last_id = decode_cursor(db, cursor)
+        stmt = stmt.where(
+            and_(ts <= last_ts, or_(ts < last_ts, table.c.id < last_id))
+        )
+    elif before is not None:
+        stmt = stmt.where(ts < timestamp_value(db, before))
+
+    return stmt.add_columns(ts.label("cursor_key")).order_by(
+        table.c.consumed_at.desc(), table.c.id.desc()
+    )
+
+
+def merge_rows(results: Iterable[Iterable]) -> Iterator:
+    """
+    Merges row iterables that are each in keyset order (see keyset_order) into one
+    iterable in the same order, reading them lazily. A row found in two of them
+    (an entry read while it was being archived) is only returned once.
+    """
+    last_id = None
+    for row in heapq.merge(*results, key=lambda row: (row.cursor_key, row.id), reverse=True):
+        if row.id != last_id:
+            yield row
+        last_id = row.id
+
+
+def page(db: Session, rows: list, limit: int):
+    """
+    Takes up to `limit + 1` rows in keyset order (one extra row tells whether there is a
+    next page) and returns the page and the cursor of the next page (None on the last page).
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(db, rows[-1].cursor_key, rows[-1].id)
+    return rows, next_cursor
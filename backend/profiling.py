@@ -0,0 +1,165 @@
+# backend/profiling.py
+"""
+Opt-in per-request profiling (enable with PROFILE_REQUESTS=1).
+
+For every request it measures the total time and the number and duration of SQL
+statements (through SQLAlchemy engine events), and reports them in the response headers:
+    Server-Timing: app;dur=12.3, db;dur=4.1
+    X-SQL-Count: 3
+Requests slower than PROFILE_SLOW_MS are logged. If PROFILE_DIR is set, every request is
+profiled (pyinstrument if installed, else cProfile) and the profiles of slow requests are
+written to that directory.
+
+The profiler only sees the event loop thread. Sync handlers run in FastAPI's threadpool,
+so to profile the handler code itself, run with DB_MODE=async (see database.py).
+Profiles of concurrent requests overlap, so profile with one request at a time.
+"""
+import contextvars
+import cProfile
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes", "on")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+logger = logging.getLogger("diet_diary.profiling")
+
+
+class RequestStats:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+
+# Stats of the request being handled. Context variables are copied into the threadpool,
+# so SQL run by sync handlers is still counted for the right request.
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+
+def install_sql_events() -> None:
+    # Listening on the Engine class covers every engine, including the async engine's sync_engine
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class _Profiler:
+    """
+    Wraps pyinstrument when it is installed, cProfile otherwise.
+    """
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler(async_mode="enabled")
+            self.extension = "html"
+        except ImportError:
+            self._profiler = cProfile.Profile()
+            self.extension = "prof"
+
+    def start(self):
+        if self.extension == "html":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.extension == "html":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self, path: str):
+        if self.extension == "html":
+            with open(path, "w") as file:
+                file.write(self._profiler.output_html())
+        else:
+            self._profiler.dump_stats(path) # Open with `python -m pstats` or snakeviz
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that times each HTTP request and counts its SQL statements.
+    """
+
+    def __init__(self, app, slow_ms: float = PROFILE_SLOW_MS, profile_dir: Optional[str] = PROFILE_DIR):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.profile_dir = profile_dir
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        install_sql_events()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        profiler = _Profiler() if self.profile_dir else None
+        started = time.perf_counter()
+        status_code = 0
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                # Timing up to the first byte of the response (a streamed body is still to come)
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timing = f"app;dur={elapsed_ms:.2f}, db;dur={stats.sql_seconds * 1000:.2f}"
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode()),
+                        (b"x-sql-count", str(stats.sql_count).encode()),
+                    ],
+                }
+            await send(message)
+
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            _current.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.slow_ms:
+                self._report_slow(scope, status_code, elapsed_ms, stats, profiler)
+
+    def _report_slow(self, scope, status_code, elapsed_ms, stats, profiler):
+        path = scope.get("path", "")
+        message = (
+            f"Slow request: {scope.get('method')} {path} -> {status_code} in {elapsed_ms:.1f} ms, "
+            f"{stats.sql_count} SQL statements ({stats.sql_seconds * 1000:.1f} ms)"
+        )
+        if profiler is not None:
+            milliseconds = time.time_ns() // 1_000_000 % 1000
+            name = (
+                f"{time.strftime('%Y%m%d-%H%M%S')}.{milliseconds:03d}-"
+                f"{scope.get('method')}{path.replace('/', '_')}.{profiler.extension}"
+            )
+            profile_path = os.path.join(self.profile_dir, name)
+            profiler.save(profile_path)
+            message += f", profile written to {profile_path}"
+        logger.warning(message)
@@ -0,0 +1,65 @@
+# backend/schemas.py
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+# Pydantic model for the request body when creating a new Calorie Entry
+
+# Add meal_type to creation model
+class CalorieEntryCreate(BaseModel):
+    food_name: str
+    calories: Optional[float] = None # Calories field is now optional
+    meal_type: str # Breakfast, Lunch, Dinner, Snacks
+
+# Pydantic model for the response body when reading or creating a Calorie Entry
+
+# Add meal_type to response model
+class CalorieEntryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True) # Enables Pydantic to read data directly from SQLAlchemy models
+
+    id: int
+    food_name: str
+    calories: float
+    meal_type: str
+    consumed_at: datetime # Serialized as ISO 8601, e.g. 2025-01-05T10:00:00
+
+# Pydantic model for updating a Calorie Entry
+class CalorieEntryUpdate(BaseModel):
+    food_name: Optional[str] = None
+    calories: Optional[float] = None
+    meal_type: Optional[str] = None
+
+# Pydantic model for one result of the food search endpoint
+class FoodSearchResult(BaseModel):
+    name: str
+    calories: float
+    unit: str
+    match: str # exact, prefix, word_prefix or fuzzy
+    score: float # Trigram similarity for fuzzy matches, 1.0 otherwise
+
+# Pydantic models for the response of the bulk import endpoint
+class BulkImportError(BaseModel):
+    row: int # 1-based row number in the uploaded data (CSV header not counted)
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[BulkImportError] # Only the first errors are listed, see 'failed' for the total
+
+# Pydantic models for the aggregated /stats/ endpoints
+class DailyStatsResponse(BaseModel):
+    date: date
+    calories: float
+    entry_count: int
+
+class WeeklyStatsResponse(BaseModel):
+    week_start: date # Monday of the week
+    calories: float
+    entry_count: int
+
+class MealStatsResponse(BaseModel):
+    meal_type: str
+    calories: float
+    entry_count: int
@@ -0,0 +1,37 @@
+# backend/serialization.py
+# Fast JSON output for lists of entries.
+# Rows come straight from column-only SELECTs (see crud.ENTRY_COLUMNS), so they are
+# turned into dicts and dumped with orjson, which serializes datetimes natively,
+# instead of being validated one by one through the Pydantic response model.
+from typing import Iterable, Iterator, Optional
+
+import orjson
+from fastapi import Response
+
+# Same fields and order as schemas.CalorieEntryResponse and crud.ENTRY_COLUMNS
+ENTRY_FIELDS = ("id", "food_name", "calories", "meal_type", "consumed_at")
+
+
+def entry_dicts(rows) -> list:
+    # zip() stops at the last entry field, so extra columns (like the cursor key) are left out
+    return [dict(zip(ENTRY_FIELDS, row)) for row in rows]
+
+
+def entries_response(rows, headers: Optional[dict] = None) -> Response:
+    return Response(content=orjson.dumps(entry_dicts(rows)), media_type="application/json", headers=headers)
+
+
+def stream_entries_json(batches: Iterable) -> Iterator[bytes]:
+    """
+    Yields a JSON array of entries piece by piece, one piece per batch of rows,
+    so the whole result never has to be in memory at once.
+    """
+    yield b"["
+    first = True
+    for rows in batches:
+        body = orjson.dumps(entry_dicts(rows))[1:-1] # Strip the brackets of each batch's array
+        if not body:
+            continue
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
@@ -0,0 +1,32 @@
+# backend/users.py
+# Identifies the user a request acts for.
+# The app has no login of its own: it is meant to run behind a gateway or proxy that
+# authenticates users and passes the user's id in the X-User-Id header. Requests without
+# the header act for DEFAULT_USER_ID, so single-user setups (and the frontend) keep working.
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+DEFAULT_USER_ID = int(os.getenv("DEFAULT_USER_ID", "1"))
+
+
+def parse_user_id(value: Optional[str]) -> int:
+    """
+    Returns the user id given in an X-User-Id header value, or DEFAULT_USER_ID if there is none.
+    Raises ValueError if the value is not a positive integer.
+    """
+    if value is None or not value.strip():
+        return DEFAULT_USER_ID
+    user_id = int(value)
+    if user_id < 1:
+        raise ValueError(value)
+    return user_id
+
+
+# Dependency used by every endpoint that reads or writes entries
+def get_user_id(x_user_id: Optional[str] = Header(None)) -> int:
+    try:
+        return parse_user_id(x_user_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid X-User-Id header")